@@ -21,10 +21,21 @@ if not GOOGLE_API_KEY:
 # Directory Settings
 UPLOAD_DIR = BASE_DIR / os.getenv("UPLOAD_DIR", "data/uploads")
 VECTORSTORE_DIR = BASE_DIR / os.getenv("VECTORSTORE_DIR", "data/vectorstore")
+CACHE_DIR = BASE_DIR / os.getenv("CACHE_DIR", "data/cache")
+EMBEDDING_CACHE_PATH = CACHE_DIR / "embeddings.sqlite3"
+SEMANTIC_CACHE_PATH = CACHE_DIR / "semantic_cache.sqlite3"
+LLM_CACHE_PATH = CACHE_DIR / "llm_cache.sqlite3"
+VECTORSTORE_CACHE_DIR = CACHE_DIR / "vectorstores"
+# Largest PDF accepted by /upload-chunk
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+# Vector codec of new FAISS indexes: "sq8" (int8), "fp16" or "flat" (float32)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "fp16").lower()
 
 # Ensure directories exist
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+VECTORSTORE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Model Settings
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
@@ -33,9 +44,41 @@ EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
 LLM_MODEL = os.getenv("LLM_MODEL", "gemini-pro")
 TEMPERATURE = float(os.getenv("TEMPERATURE", 0.7))
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", 2048))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 100))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 5))
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", 60))
+# Concurrent LLM calls when several study plans are generated one by one
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 5))
 
 # Retrieval Settings
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", 4))
+# Upper bound on the retrieved context put into a study plan prompt
+MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", 6000))
+# Token budget of that context, counted with the Gemini tokenizer (0 = chars only)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", 4000))
+SEMCACHE_THRESHOLD = float(os.getenv("SEMCACHE_THRESHOLD", 0.86))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 1000))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 3600))
+# Where LLM results are kept: "memory" (per process), "sqlite" or "redis" (shared by workers)
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Gemini context caching of study plan instructions + retrieved context; only
+# contexts of 8000+ chars are cached, so it also needs MAX_CONTEXT_CHARS and
+# TOP_K_RESULTS raised above their defaults
+PLAN_CONTEXT_CACHE = os.getenv("PLAN_CONTEXT_CACHE", "false").lower() == "true"
+PLAN_CONTEXT_CACHE_TTL = int(os.getenv("PLAN_CONTEXT_CACHE_TTL", 3600))
+# Ask Gemini for study plans as structured JSON output (response_schema)
+PLAN_JSON_SCHEMA = os.getenv("PLAN_JSON_SCHEMA", "true").lower() == "true"
+
+# Server Settings
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 64))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+UVICORN_WORKERS = int(os.getenv("UVICORN_WORKERS", 1))
+UVICORN_LOOP = os.getenv("UVICORN_LOOP", "auto")
+UVICORN_HTTP = os.getenv("UVICORN_HTTP", "auto")
 
 # Application Info
 APP_NAME = "StudyRAG"
@@ -0,0 +1,93 @@
+"""
+Embedding Cache for StudyRAG
+Persists document embeddings in SQLite so identical chunks are never
+sent to the embedding API twice (e.g. when the same PDF is re-uploaded).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+from blake3 import blake3
+
+# SQLite caps the number of bound parameters per statement
+_MAX_SQL_PARAMS = 500
+
+
+def content_hash(data: bytes) -> bytes:
+    """
+    32-byte BLAKE3 digest of data.
+
+    The digest keys the persistent embedding cache and seeds mock
+    embeddings, so it must be the same in every environment.
+    """
+    return blake3(data).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store backed by SQLite.
+
+    Keys are content_hash(model_name + "\\0" + text), so vectors produced by
+    different embedding models never mix. Vectors are stored as float32
+    bytes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb (key BLOB PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> bytes:
+        """Build the cache key for a text embedded with the given model."""
+        return content_hash(f"{model_name}\0{text}".encode("utf-8"))
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up several keys at once.
+
+        Returns:
+            Dict mapping every key that was found to its float32 vector
+        """
+        unique_keys = list(dict.fromkeys(keys))
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            for start in range(0, len(unique_keys), _MAX_SQL_PARAMS):
+                chunk = unique_keys[start:start + _MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, vec in rows:
+                    found[bytes(key)] = np.frombuffer(vec, dtype=np.float32)
+
+        return found
+
+    def put_many(self, items: Iterable[Tuple[bytes, Sequence[float]]]) -> None:
+        """Store (key, vector) pairs, replacing existing entries."""
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)",
+                rows,
+            )
+            self._conn.commit()
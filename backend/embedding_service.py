@@ -10,118 +10,387 @@ calling the real Google API. Enable it by setting:
 
 from __future__ import annotations
 
-import hashlib
+import asyncio
+import functools
+import logging
 import os
 import random
-from typing import List
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
 
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
+import numpy as np
 
-from backend.config import GOOGLE_API_KEY, EMBEDDING_MODEL
+from backend.config import (
+    EMBEDDING_MODEL,
+    EMBED_BATCH_SIZE,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
+    EMBEDDING_CACHE_PATH,
+    GEMINI_RPM,
+)
+from backend.embedding_cache import EmbeddingCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class _RateLimiter:
+    """
+    Thread-safe token bucket allowing `rate` calls per `period` seconds.
+
+    Callers block until a token is free, so bursts queue up client-side
+    instead of being rejected by the API with 429 errors.
+    """
+
+    def __init__(self, rate: int, period: float = 60.0) -> None:
+        self.capacity = max(1, rate)
+        self.fill_rate = self.capacity / period
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.fill_rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+# Shared by every embed_content call in the process
+_rate_limiter = _RateLimiter(GEMINI_RPM)
+
+
+def _embed_content(**kwargs):
+    """
+    Call genai.embed_content under the rate limiter.
+
+    Quota and transient server errors are retried up to EMBED_MAX_RETRIES
+    times with jittered exponential backoff; after that, and for any other
+    error, the exception propagates to the caller.
+    """
+    import google.generativeai as genai  # already loaded by EmbeddingService
+    from google.api_core import exceptions as google_exceptions
+
+    retryable = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        _rate_limiter.acquire()
+        try:
+            return genai.embed_content(**kwargs)
+        except retryable as exc:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+            logger.warning(
+                "Gemini embed_content error (%s), retrying in %.1fs (%d/%d)",
+                type(exc).__name__, delay, attempt + 1, EMBED_MAX_RETRIES,
+            )
+            time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_query_embed(model_name: str, query: str) -> np.ndarray:
+    """
+    Embed a search query, memoizing the result per (model, query).
+
+    Returns a read-only float32 vector so cached values can't be
+    mutated by callers. API errors propagate, so failed calls are
+    never cached.
+    """
+    result = _embed_content(
+        model=model_name,
+        content=query,
+        task_type="retrieval_query",
+    )
+    vector = np.asarray(result["embedding"], dtype=np.float32)
+    vector.setflags(write=False)
+    return vector
+
+
+def query_cache_info() -> Dict[str, Optional[int]]:
+    """Hit/miss statistics of the query embedding cache."""
+    return _cached_query_embed.cache_info()._asdict()
 
 
 class EmbeddingService:
     """
     Service for generating embeddings using Google Gemini API, with optional mock mode.
+
+    Embeddings are returned as float32 NumPy arrays (one vector, or one
+    row per text), the layout FAISS consumes directly.
+
+    The Google SDK is imported on first real-mode construction only, so
+    MOCK mode never pays for loading protobuf/grpc. All API calls share
+    a GEMINI_RPM rate limit and are retried on quota errors; failures
+    are raised rather than replaced with mock vectors, which would
+    silently poison the vectorstore.
     """
 
     def __init__(self) -> None:
         """Initialize the Google Gemini API with API key or mock mode."""
         self.use_mock = os.getenv("USE_MOCK_EMBEDDINGS", "false").lower() == "true"
         self.mock_dim = int(os.getenv("MOCK_EMBEDDING_DIM", "256"))
+        use_cache = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+        self.cache: Optional[EmbeddingCache] = None
 
         if self.use_mock:
             self.model_name = "mock"
-            print(
-                f"✓ Embedding Service initialized in MOCK mode "
-                f"(dimension={self.mock_dim}, no Google API calls)"
+            logger.info(
+                "Embedding Service initialized in MOCK mode "
+                "(dimension=%d, no Google API calls)",
+                self.mock_dim,
             )
         else:
-            genai.configure(api_key=GOOGLE_API_KEY)
+            from backend.llm_client import configure_genai
+
+            configure_genai()
             self.model_name = EMBEDDING_MODEL
-            print(f"✓ Embedding Service initialized with model: {self.model_name}")
+            if use_cache:
+                self.cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+            logger.info("Embedding Service initialized with model: %s", self.model_name)
 
-    def _mock_embedding(self, text: str) -> List[float]:
+    def _mock_embedding(self, text: str) -> np.ndarray:
         """
         Deterministic mock embedding for a given text.
 
         Uses a hash of the text as RNG seed so the same text
         always produces the same vector.
         """
-        digest = hashlib.sha256(text.encode("utf-8")).digest()
-        seed = int.from_bytes(digest[:8], "big")
-        rng = random.Random(seed)
-        return [rng.uniform(-1.0, 1.0) for _ in range(self.mock_dim)]
+        return self._mock_embeddings([text])[0]
+
+    def _mock_embeddings(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Deterministic mock embeddings for several texts at once.
+
+        All seeds are decoded from the digests in one np.frombuffer call and
+        rows are written straight into a preallocated float32 matrix, so
+        the result matches _mock_embedding row for row.
+        """
+        seeds = np.frombuffer(
+            b"".join(content_hash(text.encode("utf-8"))[:8] for text in texts),
+            dtype=">u8",
+        )
+        matrix = np.empty((len(texts), self.mock_dim), dtype=np.float32)
+        for i, seed in enumerate(seeds):
+            matrix[i] = np.random.default_rng(int(seed)).uniform(-1.0, 1.0, self.mock_dim)
+        return matrix
+
+    @staticmethod
+    def _stack(vectors: Sequence[np.ndarray]) -> np.ndarray:
+        """Copy row vectors into a single preallocated float32 matrix."""
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+
+        matrix = np.empty((len(vectors), len(vectors[0])), dtype=np.float32)
+        for i, vector in enumerate(vectors):
+            matrix[i] = vector
+        return matrix
 
-    def embed_text(self, text: str) -> List[float]:
+    def _lookup_cached(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Return cached document embeddings for texts, None for misses.
+        """
+        if self.cache is None:
+            return [None] * len(texts)
+
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        found = self.cache.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def _store_cached(self, texts: Sequence[str], vectors: Sequence[np.ndarray]) -> None:
+        """
+        Cache document embeddings returned by the API.
+
+        Only real API results are stored; MOCK vectors never reach
+        this method.
+        """
+        if self.cache is None:
+            return
+
+        self.cache.put_many(
+            (EmbeddingCache.make_key(self.model_name, text), vector)
+            for text, vector in zip(texts, vectors)
+        )
+
+    def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
 
-        In MOCK mode or on Google API quota errors, this falls back
-        to deterministic random vectors so that the rest of the
-        pipeline keeps working for development.
+        In MOCK mode this returns a deterministic random vector so that
+        the rest of the pipeline keeps working for development.
         """
         if self.use_mock:
             return self._mock_embedding(text)
 
-        try:
-            result = genai.embed_content(
-                model=self.model_name,
-                content=text,
-                task_type="retrieval_document",
-            )
-            return result["embedding"]
-        except google_exceptions.GoogleAPIError as exc:
-            # Typical case: 429 quota exceeded
-            print(
-                f"⚠️ Gemini embed_content error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK embeddings."
-            )
-            return self._mock_embedding(text)
-        except Exception as exc:  # pragma: no cover - defensive
-            print(
-                f"⚠️ Unexpected embedding error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK embeddings."
-            )
-            return self._mock_embedding(text)
+        cached = self._lookup_cached([text])[0]
+        if cached is not None:
+            return cached
+
+        result = _embed_content(
+            model=self.model_name,
+            content=text,
+            task_type="retrieval_document",
+        )
+        vector = np.asarray(result["embedding"], dtype=np.float32)
+        self._store_cached([text], [vector])
+        return vector
 
-    def embed_query(self, query: str) -> List[float]:
+    def embed_query(self, query: str) -> np.ndarray:
         """
         Generate embedding for a search query.
+
+        Repeated queries are served from an in-memory LRU cache; MOCK
+        mode bypasses it since mock vectors are already deterministic.
         """
         if self.use_mock:
             return self._mock_embedding(query)
 
-        try:
-            result = genai.embed_content(
+        return _cached_query_embed(self.model_name, query)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for several search queries at once.
+
+        Queries are sent in batches of EMBED_BATCH_SIZE, so N queries cost
+        ceil(N / EMBED_BATCH_SIZE) round-trips; one row per query.
+        """
+        if self.use_mock:
+            return self._mock_embeddings(queries)
+
+        matrix = None
+        for start in range(0, len(queries), EMBED_BATCH_SIZE):
+            batch = queries[start:start + EMBED_BATCH_SIZE]
+            result = _embed_content(
                 model=self.model_name,
-                content=query,
+                content=batch,
                 task_type="retrieval_query",
             )
-            return result["embedding"]
-        except google_exceptions.GoogleAPIError as exc:
-            print(
-                f"⚠️ Gemini embed_content (query) error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK embeddings."
-            )
-            return self._mock_embedding(query)
-        except Exception as exc:  # pragma: no cover - defensive
-            print(
-                f"⚠️ Unexpected query embedding error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK embeddings."
-            )
-            return self._mock_embedding(query)
+            vectors = np.asarray(result["embedding"], dtype=np.float32)
+            if matrix is None:
+                matrix = np.empty((len(queries), vectors.shape[1]), dtype=np.float32)
+            matrix[start:start + len(batch)] = vectors
+        return matrix if matrix is not None else np.empty((0, 0), dtype=np.float32)
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of documents with a single embed_content call.
+        """
+        result = _embed_content(
+            model=self.model_name,
+            content=texts,
+            task_type="retrieval_document",
+        )
+        vectors = np.asarray(result["embedding"], dtype=np.float32)
+        self._store_cached(texts, vectors)
+        return vectors
+
+    @staticmethod
+    def _first_occurrences(texts: Sequence[str], indices: Sequence[int]) -> Dict[str, int]:
+        """
+        Map each distinct text among indices to the first index holding it.
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        Repeated chunks (running headers, boilerplate pages) are then sent
+        to the API once and their vector is copied to the duplicates.
+        """
+        first: Dict[str, int] = {}
+        for i in indices:
+            first.setdefault(texts[i], i)
+        return first
+
+    def _length_sorted_batches(
+        self, texts: Sequence[str], indices: Sequence[int]
+    ) -> List[List[int]]:
+        """
+        Split the given text indices into batches of EMBED_BATCH_SIZE.
+
+        Indices are sorted by text length first so each request carries
+        similarly sized inputs; ties keep document order.
+        """
+        order = sorted(indices, key=lambda i: len(texts[i]))
+        return [
+            order[start:start + EMBED_BATCH_SIZE]
+            for start in range(0, len(order), EMBED_BATCH_SIZE)
+        ]
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple documents.
+
+        Cached vectors are reused; the remaining distinct texts are sorted
+        by length and sent in batches of EMBED_BATCH_SIZE, so N uncached
+        chunks cost ceil(N / EMBED_BATCH_SIZE) round-trips instead of N.
+        Results are scattered back to input order, one row per text.
         """
-        return [self.embed_text(text) for text in texts]
+        if self.use_mock:
+            return self._mock_embeddings(texts)
+
+        embeddings = self._lookup_cached(texts)
+        pending = [i for i, vector in enumerate(embeddings) if vector is None]
+        first = self._first_occurrences(texts, pending)
+
+        for batch_indices in self._length_sorted_batches(texts, list(first.values())):
+            batch = [texts[i] for i in batch_indices]
+            for i, vector in zip(batch_indices, self._embed_batch(batch)):
+                embeddings[i] = vector
+
+        for i in pending:
+            embeddings[i] = embeddings[first[texts[i]]]
+
+        return self._stack(embeddings)
+
+    async def aembed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        Async variant of embed_documents.
+
+        Up to EMBED_CONCURRENCY batches are in flight at once, each running
+        the blocking SDK call in a worker thread. A small random delay
+        before each request spreads out bursts that would otherwise hit
+        the quota at the same instant.
+        """
+        if self.use_mock:
+            return self.embed_documents(texts)
+
+        embeddings = await asyncio.to_thread(self._lookup_cached, texts)
+        pending = [i for i, vector in enumerate(embeddings) if vector is None]
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+        async def embed(batch_indices: List[int]) -> np.ndarray:
+            async with semaphore:
+                await asyncio.sleep(random.uniform(0, 0.05))
+                batch = [texts[i] for i in batch_indices]
+                return await asyncio.to_thread(self._embed_batch, batch)
+
+        first = self._first_occurrences(texts, pending)
+        batches = self._length_sorted_batches(texts, list(first.values()))
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+
+        for batch_indices, vectors in zip(batches, results):
+            for i, vector in zip(batch_indices, vectors):
+                embeddings[i] = vector
+
+        for i in pending:
+            embeddings[i] = embeddings[first[texts[i]]]
+
+        return self._stack(embeddings)
 
 
 # Singleton instance
 _embedding_service = None
+_embedding_service_lock = threading.Lock()
 
 
 def get_embedding_service() -> EmbeddingService:
@@ -133,5 +402,7 @@ def get_embedding_service() -> EmbeddingService:
     """
     global _embedding_service
     if _embedding_service is None:
-        _embedding_service = EmbeddingService()
+        with _embedding_service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService()
     return _embedding_service
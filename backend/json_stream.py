@@ -0,0 +1,100 @@
+"""
+Incremental JSON extraction for StudyRAG
+Pulls the items of one top-level array out of a JSON document while it is
+still arriving, so streamed LLM replies can be shown item by item.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, Optional
+
+import orjson
+
+
+class JSONArrayItemStream:
+    """
+    Yields the complete elements of `document[key]` as text is fed in.
+
+    A small pushdown scanner tracks nesting depth and string/escape state
+    over each character once; an element is handed to orjson only when
+    its closing bracket arrives. Text outside the top-level object (such
+    as a markdown fence around it) is ignored. Only object elements are
+    extracted, which is all the quiz and plan replies contain.
+
+    Args:
+        key: Name of the array member of the top-level object
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._member: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add the next piece of the document.
+
+        Returns:
+            Elements completed by this piece, in document order
+        """
+        items: List[Any] = []
+        if self.done:
+            return items
+
+        self._buffer += text
+        buffer = self._buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buffer[self._string_start:pos]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos + 1
+            elif char in "{[":
+                if self._depth == 1 and char == "[" and self._member == self.key:
+                    self._array_depth = 2
+                elif self._depth == self._array_depth and char == "{":
+                    self._item_start = pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == self._array_depth and self._item_start is not None:
+                    items.append(orjson.loads(buffer[self._item_start:pos + 1]))
+                    self._item_start = None
+                elif self._array_depth is not None and self._depth < self._array_depth:
+                    self.done = True
+                    break
+            elif self._depth == 1:
+                if char == ":":
+                    self._member = self._last_string
+                elif char == ",":
+                    self._member = None
+
+        # Keep only what a later element could still need
+        keep_from = self._item_start if self._item_start is not None else len(buffer)
+        if self._in_string and self._depth == 1:
+            keep_from = min(keep_from, self._string_start)
+        self._buffer = buffer[keep_from:]
+        self._string_start -= keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        self._pos = len(self._buffer)
+        return items
@@ -0,0 +1,328 @@
+"""
+LLM Response Cache for StudyRAG
+Serves repeated /ask prompts, quiz and study plan requests from memory
+instead of calling Gemini again.
+
+Near-duplicate questions are handled by the semantic cache in front of
+/ask; this cache only matches exact requests. Enabled by default; disable
+it by setting:
+
+    USE_LLM_CACHE=false
+
+The cache lives in process memory unless LLM_CACHE_BACKEND selects a
+store shared by all workers (and kept across restarts):
+
+    LLM_CACHE_BACKEND=sqlite   # CACHE_DIR/llm_cache.sqlite3, one host
+    LLM_CACHE_BACKEND=redis    # REDIS_URL, needs the `redis` package
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from backend.config import (
+    LLM_CACHE_BACKEND,
+    LLM_CACHE_PATH,
+    LLM_CACHE_SIZE,
+    LLM_CACHE_TTL,
+    REDIS_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for Redis before treating a call as a cache miss
+_REDIS_TIMEOUT = 0.5
+
+
+def _dumps(value: Any) -> bytes:
+    """Serialize a cached value for a shared store."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+class LLMCache:
+    """
+    Thread-safe LRU cache of parsed LLM results with a time-to-live.
+
+    Entries are tagged with the vectorstore they were generated from, so
+    re-uploading a document drops exactly its entries. Values are
+    deep-copied in and out: callers may mutate what they get.
+    """
+
+    # Entries are only seen by this process
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.enabled = os.getenv("USE_LLM_CACHE", "true").lower() == "true"
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (expiry, vectorstore name, value); least recently used first
+        self._entries: OrderedDict[str, Tuple[float, Optional[str], Any]] = OrderedDict()
+
+    @staticmethod
+    def make_key(**fields: Any) -> str:
+        """Digest of the fields that determine an LLM result."""
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a copy of the cached value, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            value = entry[2]
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Any, vectorstore_name: Optional[str]) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        if not self.enabled:
+            return
+
+        entry = (time.monotonic() + self.ttl, vectorstore_name, copy.deepcopy(value))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Drop one entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, vectorstore_name: str) -> None:
+        """Drop every entry generated from a vectorstore."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == vectorstore_name]:
+                del self._entries[key]
+
+    def info(self) -> Dict[str, int]:
+        """Number of entries and capacity."""
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize}
+
+    # Variants for the event loop: shared stores do disk or network I/O,
+    # so they are called from a worker thread
+    async def aget(self, key: str) -> Optional[Any]:
+        """get without blocking the event loop."""
+        if not self.shared:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: Any, vectorstore_name: Optional[str]) -> None:
+        """put without blocking the event loop."""
+        if not self.shared:
+            return self.put(key, value, vectorstore_name)
+        await asyncio.to_thread(self.put, key, value, vectorstore_name)
+
+    async def aclear(self, vectorstore_name: str) -> None:
+        """clear without blocking the event loop."""
+        if not self.shared:
+            return self.clear(vectorstore_name)
+        await asyncio.to_thread(self.clear, vectorstore_name)
+
+
+class SQLiteLLMCache(LLMCache):
+    """
+    LLMCache in a SQLite file, shared by the worker processes of a host.
+
+    Expiry uses wall-clock time since entries outlive the process. When
+    more than maxsize entries are stored, the ones expiring first go.
+    """
+
+    shared = True
+
+    def __init__(self, path: Path, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        # Workers write concurrently; wait for each other's transactions
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llmcache "
+                "(key TEXT PRIMARY KEY, vectorstore TEXT, expires REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS llmcache_vectorstore ON llmcache (vectorstore)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS llmcache_expires ON llmcache (expires)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llmcache WHERE key = ? AND expires >= ?",
+                (key, time.time()),
+            ).fetchone()
+        return None if row is None else orjson.loads(row[0])
+
+    def put(self, key: str, value: Any, vectorstore_name: Optional[str]) -> None:
+        """Store a value, evicting expired and then the oldest entries when full."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        payload = _dumps(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llmcache (key, vectorstore, expires, value) "
+                "VALUES (?, ?, ?, ?)",
+                (key, vectorstore_name, now + self.ttl, payload),
+            )
+            self._conn.execute("DELETE FROM llmcache WHERE expires < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llmcache WHERE key IN ("
+                "SELECT key FROM llmcache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """Drop one entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llmcache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self, vectorstore_name: str) -> None:
+        """Drop every entry generated from a vectorstore."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llmcache WHERE vectorstore = ?", (vectorstore_name,))
+            self._conn.commit()
+
+    def info(self) -> Dict[str, int]:
+        """Number of entries and capacity."""
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM llmcache").fetchone()
+        return {"size": size, "maxsize": self.maxsize}
+
+
+class RedisLLMCache(LLMCache):
+    """
+    LLMCache in Redis, shared by every worker and host using REDIS_URL.
+
+    Entries expire through Redis TTLs; each vectorstore has a set of its
+    keys so clear() drops exactly its entries. Capacity is left to the
+    server's maxmemory policy. Calls time out after _REDIS_TIMEOUT; a
+    Redis error is logged and treated as a miss, so an unavailable Redis
+    only costs the cache.
+    """
+
+    shared = True
+    _PREFIX = "studyrag:llm:"
+
+    def __init__(self, url: str, maxsize: int, ttl: float) -> None:
+        super().__init__(maxsize, ttl)
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError("LLM_CACHE_BACKEND=redis requires the `redis` package") from exc
+        self._redis = redis.Redis.from_url(
+            url, socket_timeout=_REDIS_TIMEOUT, socket_connect_timeout=_REDIS_TIMEOUT
+        )
+        self._redis_errors = redis.RedisError
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing, expired or Redis fails."""
+        if not self.enabled:
+            return None
+
+        try:
+            payload = self._redis.get(self._PREFIX + key)
+        except self._redis_errors as exc:
+            logger.warning("Redis LLM cache read failed (%s): %s", type(exc).__name__, exc)
+            return None
+        return None if payload is None else orjson.loads(payload)
+
+    def put(self, key: str, value: Any, vectorstore_name: Optional[str]) -> None:
+        """Store a value for ttl seconds."""
+        if not self.enabled:
+            return
+
+        ttl = max(int(self.ttl), 1)
+        pipe = self._redis.pipeline()
+        pipe.set(self._PREFIX + key, _dumps(value), ex=ttl)
+        if vectorstore_name is not None:
+            members = f"{self._PREFIX}vectorstore:{vectorstore_name}"
+            pipe.sadd(members, key)
+            pipe.expire(members, ttl)
+        try:
+            pipe.execute()
+        except self._redis_errors as exc:
+            logger.warning("Redis LLM cache write failed (%s): %s", type(exc).__name__, exc)
+
+    def delete(self, key: str) -> None:
+        """Drop one entry."""
+        try:
+            self._redis.delete(self._PREFIX + key)
+        except self._redis_errors as exc:
+            logger.warning("Redis LLM cache delete failed (%s): %s", type(exc).__name__, exc)
+
+    def clear(self, vectorstore_name: str) -> None:
+        """Drop every entry generated from a vectorstore."""
+        members = f"{self._PREFIX}vectorstore:{vectorstore_name}"
+        try:
+            keys = [self._PREFIX + key.decode("utf-8") for key in self._redis.smembers(members)]
+            self._redis.delete(members, *keys)
+        except self._redis_errors as exc:
+            logger.warning("Redis LLM cache clear failed (%s): %s", type(exc).__name__, exc)
+
+    def info(self) -> Dict[str, int]:
+        """
+        Capacity only.
+
+        Entries are not counted: the database may hold other keys, and
+        counting the cache's own keys would need a full SCAN.
+        """
+        return {"maxsize": self.maxsize}
+
+
+# Singleton instance
+_llm_cache: Optional[LLMCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """
+    Get or create singleton LLM response cache instance.
+
+    Returns:
+        LLMCache instance
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                if LLM_CACHE_BACKEND == "sqlite":
+                    _llm_cache = SQLiteLLMCache(LLM_CACHE_PATH, LLM_CACHE_SIZE, LLM_CACHE_TTL)
+                elif LLM_CACHE_BACKEND == "redis":
+                    _llm_cache = RedisLLMCache(REDIS_URL, LLM_CACHE_SIZE, LLM_CACHE_TTL)
+                else:
+                    _llm_cache = LLMCache(LLM_CACHE_SIZE, LLM_CACHE_TTL)
+    return _llm_cache
@@ -0,0 +1,57 @@
+"""
+Shared Gemini Client for StudyRAG
+Configures the google-generativeai SDK once per process and hands every
+service the same GenerativeModel.
+
+genai.configure replaces module-level client state, so services calling
+it from their own constructors (possibly on different threads during
+startup) could race; sharing one model also means one set of gRPC
+channels for /ask, quizzes and study plans.
+
+The SDK (protobuf, grpc and the generated API stubs) is imported on first
+use, so processes running with mock LLM and embeddings never load it.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Optional
+
+from backend.config import GOOGLE_API_KEY, LLM_MODEL
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+_configured = False
+_llm_model: Optional[genai.GenerativeModel] = None
+_lock = threading.Lock()
+
+
+def configure_genai() -> None:
+    """Configure the SDK with the API key, once."""
+    global _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                import google.generativeai as genai
+
+                genai.configure(api_key=GOOGLE_API_KEY)
+                _configured = True
+
+
+def get_llm_model() -> genai.GenerativeModel:
+    """
+    Get or create the shared LLM_MODEL instance.
+
+    Returns:
+        GenerativeModel shared by all services
+    """
+    global _llm_model
+    if _llm_model is None:
+        configure_genai()
+        with _lock:
+            if _llm_model is None:
+                import google.generativeai as genai
+
+                _llm_model = genai.GenerativeModel(LLM_MODEL)
+    return _llm_model
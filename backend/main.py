@@ -2,24 +2,49 @@
 FastAPI Application for StudyRAG
 REST API endpoints for PDF upload and Q&A
 """
+import asyncio
+import logging
 import os
+import re
 import shutil
+import threading
+import time
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from typing import Annotated, Optional, List, Dict, Any, AsyncIterator, Generator, Iterator, Literal, Tuple, Union
+
+import anyio.to_thread
+import orjson
+from fastapi import Depends, FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from backend.config import (
     APP_NAME,
     APP_VERSION,
     APP_DESCRIPTION,
-    UPLOAD_DIR
+    UPLOAD_DIR,
+    MAX_UPLOAD_BYTES,
+    THREADPOOL_SIZE,
+    LOG_LEVEL
+)
+from backend.embedding_service import query_cache_info
+from backend.llm_cache import get_llm_cache
+from backend.rag_pipeline import RAGPipeline, get_rag_pipeline
+from backend.retrieval_service import RetrievalService, get_retrieval_service
+from backend.semantic_cache import SemanticCache, cache_namespace, get_semantic_cache
+from backend.study_plan_generator import StudyPlanGenerator, get_study_plan_generator_async
+from backend.quiz_generator import QuizGenerator, get_quiz_generator
+
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
 )
-from backend.rag_pipeline import get_rag_pipeline
-from backend.retrieval_service import get_retrieval_service
-from backend.study_plan_generator import get_study_plan_generator
-from backend.quiz_generator import get_quiz_generator
+logger = logging.getLogger(__name__)
 
 
 # Pydantic Models
@@ -74,6 +99,16 @@ class StudyPlanResponse(BaseModel):
     days: List[StudyDay]
 
 
+class StudyPlanBatchRequest(BaseModel):
+    """Request model for generating several study plans at once"""
+    plans: List[StudyPlanRequest] = Field(..., min_length=1, max_length=5, description="Plan istekleri")
+
+
+class StudyPlanBatchResponse(BaseModel):
+    """Response model for batched study plan generation"""
+    plans: List[StudyPlanResponse]
+
+
 class QuizQuestion(BaseModel):
     """Single question in a quiz"""
     id: int
@@ -104,11 +139,72 @@ class QuizResponse(BaseModel):
     note: Optional[str] = None
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Size the worker thread pools and build the services.
+
+    asyncio.to_thread uses the event loop's default executor, while
+    Starlette runs sync code through anyio's limiter; both get
+    THREADPOOL_SIZE workers. Services are constructed here instead of at
+    import time, in worker threads, so importing the app stays cheap.
+    """
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREADPOOL_SIZE)
+    )
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+    app.state.rag_pipeline = await asyncio.to_thread(get_rag_pipeline)
+    app.state.retrieval_service = await asyncio.to_thread(get_retrieval_service)
+    app.state.study_plan_generator = await get_study_plan_generator_async()
+    app.state.quiz_generator = await asyncio.to_thread(get_quiz_generator)
+    app.state.semantic_cache = await asyncio.to_thread(get_semantic_cache)
+    yield
+
+
+class AskOperation(QuestionRequest):
+    """/ask call inside a batch"""
+    op: Literal["ask"]
+
+
+class StudyPlanOperation(StudyPlanRequest):
+    """/study-plan call inside a batch"""
+    op: Literal["plan"]
+
+
+class QuizOperation(QuizRequest):
+    """/generate-quiz call inside a batch"""
+    op: Literal["quiz"]
+
+
+class BatchRequest(BaseModel):
+    """Request model for running several operations in one call"""
+    ops: List[Annotated[
+        Union[AskOperation, StudyPlanOperation, QuizOperation],
+        Field(discriminator="op")
+    ]] = Field(..., min_length=1, max_length=10, description="İşlemler (ask, plan, quiz)")
+
+
+class BatchResult(BaseModel):
+    """Outcome of a single batch operation"""
+    op: str
+    ok: bool
+    result: Optional[Dict[str, Any]] = None
+    detail: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    """Response model for batch calls, in request order"""
+    results: List[BatchResult]
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
-    description=APP_DESCRIPTION
+    description=APP_DESCRIPTION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -121,11 +217,92 @@ app.add_middleware(
 )
 
 
-# Initialize services
-rag_pipeline = get_rag_pipeline()
-retrieval_service = get_retrieval_service()
-study_plan_generator = get_study_plan_generator()
-quiz_generator = get_quiz_generator()
+class _APIGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware limited to API responses.
+
+    The UI routes serve precompressed variants, and compressing the
+    streaming endpoints would buffer events that must reach the client
+    as produced.
+    """
+
+    _skip_prefixes = (
+        "/ui", "/static/", "/ask/stream", "/generate-quiz/stream", "/study-plan/stream"
+    )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self._skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Answers, quizzes and plans are text-heavy JSON; tiny bodies aren't worth it
+app.add_middleware(_APIGZipMiddleware, minimum_size=1024, compresslevel=6)
+
+
+# Service dependencies (async so FastAPI doesn't dispatch them to a thread)
+async def _rag_pipeline(request: Request) -> RAGPipeline:
+    return request.app.state.rag_pipeline
+
+
+async def _retrieval_service(request: Request) -> RetrievalService:
+    return request.app.state.retrieval_service
+
+
+async def _study_plan_generator(request: Request) -> StudyPlanGenerator:
+    return request.app.state.study_plan_generator
+
+
+async def _quiz_generator(request: Request) -> QuizGenerator:
+    return request.app.state.quiz_generator
+
+
+async def _semantic_cache(request: Request) -> SemanticCache:
+    return request.app.state.semantic_cache
+
+
+# Upload copy settings
+_COPY_BUFFER_SIZE = 1024 * 1024
+_COPY_FILE_RANGE_CHUNK = 1 << 30
+_PDF_MAGIC = b"%PDF-"
+
+# Chunked uploads (/upload-chunk)
+_PARTIAL_UPLOAD_DIR = Path(UPLOAD_DIR) / ".partial"
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# Largest piece accepted by /upload-chunk (the UI sends 1 MiB)
+_MAX_UPLOAD_PIECE = 8 * 1024 * 1024
+# Unfinished chunked uploads are deleted after a day without new pieces
+_PARTIAL_UPLOAD_TTL = 24 * 3600
+_PARTIAL_SWEEP_INTERVAL = 3600
+
+
+def _save_upload(upload: UploadFile, destination: Path) -> None:
+    """
+    Copy an uploaded file to disk.
+
+    Uploads that Starlette has already spooled to a temporary file are
+    copied in-kernel with os.copy_file_range (Linux); small in-memory
+    uploads, and platforms without copy_file_range, go through
+    copyfileobj with a 1 MiB buffer.
+    """
+    source = upload.file
+    source.seek(0)
+    with open(destination, "wb") as target:
+        # SpooledTemporaryFile sets _rolled once its data lives in a real file
+        if hasattr(os, "copy_file_range") and getattr(source, "_rolled", False):
+            try:
+                src_fd, dst_fd = source.fileno(), target.fileno()
+                while os.copy_file_range(src_fd, dst_fd, _COPY_FILE_RANGE_CHUNK) > 0:
+                    pass
+                return
+            except OSError:
+                # e.g. unsupported filesystem: restart with a userspace copy
+                source.seek(0)
+                target.seek(0)
+                target.truncate()
+        shutil.copyfileobj(source, target, length=_COPY_BUFFER_SIZE)
 
 
 @app.get("/")
@@ -137,9 +314,16 @@ async def root():
         "description": APP_DESCRIPTION,
         "endpoints": {
             "upload": "/upload - Upload PDF and create vector store",
+            "upload-chunk": "/upload-chunk - Upload a PDF in pieces (Content-Range)",
+            "upload-chunk-status": "/upload-chunk/{upload_id} - Received ranges of a chunked upload",
             "ask": "/ask - Ask questions about uploaded document",
+            "ask-stream": "/ask/stream - Ask and stream the answer (Server-Sent Events)",
             "generate-quiz": "/generate-quiz - Generate quiz from document",
+            "generate-quiz-stream": "/generate-quiz/stream - Generate a quiz, streaming questions (NDJSON)",
             "study-plan": "/study-plan - Generate study plan",
+            "study-plan-stream": "/study-plan/stream - Generate a study plan, streaming days (NDJSON)",
+            "plans-batch": "/plans/batch - Generate several study plans with one shared context",
+            "batch": "/batch - Run several ask/plan/quiz operations in one request",
             "docs": "/docs - Interactive API documentation"
         }
     }
@@ -148,7 +332,9 @@ async def root():
 @app.post("/upload", response_model=UploadResponse)
 async def upload_pdf(
     file: UploadFile = File(..., description="PDF file to upload"),
-    vectorstore_name: str = Form(default="default", description="Name for the vector store")
+    vectorstore_name: str = Form(default="default", description="Name for the vector store"),
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    semantic_cache: SemanticCache = Depends(_semantic_cache)
 ):
     """
     Upload a PDF file and create a vector store
@@ -156,38 +342,338 @@ async def upload_pdf(
     - **file**: PDF file to process
     - **vectorstore_name**: Optional name for the vector store (default: "default")
     """
-    # Validate file type
-    if not file.filename.endswith('.pdf'):
+    # Validate file type by its magic bytes; the filename is user-controlled
+    filename = _pdf_filename(file.filename or "")
+    head = await file.read(len(_PDF_MAGIC))
+    await file.seek(0)
+    if head != _PDF_MAGIC:
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
         # Save uploaded file
-        file_path = Path(UPLOAD_DIR) / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        file_path = Path(UPLOAD_DIR) / filename
+        await asyncio.to_thread(_save_upload, file, file_path)
         
-        print(f"\n📤 Uploaded file: {file.filename}")
+        logger.info("Uploaded file: %s", filename)
         
-        # Process PDF with RAG pipeline
-        vectorstore = rag_pipeline.process_pdf(str(file_path), vectorstore_name)
+        return await _ingest_pdf(
+            file_path, filename, vectorstore_name, rag_pipeline, semantic_cache
+        )
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+
+
+async def _ingest_pdf(
+    file_path: Path,
+    filename: str,
+    vectorstore_name: str,
+    rag_pipeline: RAGPipeline,
+    semantic_cache: SemanticCache,
+) -> UploadResponse:
+    """Build the vectorstore of a saved PDF and describe the result."""
+    # Process PDF with RAG pipeline
+    vectorstore = await rag_pipeline.aprocess_pdf(str(file_path), vectorstore_name)
+    semantic_cache.clear(vectorstore_name)
+    await get_llm_cache().aclear(vectorstore_name)
+    
+    # Get document count
+    num_chunks = vectorstore.index.ntotal if vectorstore else 0
+    
+    return UploadResponse(
+        success=True,
+        message=f"PDF processed successfully. Vector store '{vectorstore_name}' created.",
+        filename=filename,
+        vectorstore_name=vectorstore_name,
+        num_chunks=num_chunks
+    )
+
+
+def _write_chunk(path: Path, offset: int, data: bytes) -> None:
+    """Write data at offset of path, creating the file if needed."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if hasattr(os, "pwrite"):
+            os.pwrite(fd, data, offset)
+        else:  # pragma: no cover - Windows
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _pdf_filename(raw: str) -> str:
+    """
+    Base name of a client-supplied PDF file name.
+
+    Raises:
+        HTTPException: for empty or dot names and names not ending in .pdf
+    """
+    name = Path(raw).name
+    if not name or name.startswith(".") or not name.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="A file name ending in .pdf is required")
+    return name
+
+
+def _check_upload_total(path: Path, total: int) -> bool:
+    """
+    Record the total size of a chunked upload, or compare with the recorded one.
+
+    The first piece links a complete file into place (os.link fails if
+    one exists), so every piece reads a fully written size.
+    """
+    if not path.exists():
+        staging = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        staging.write_text(str(total))
+        try:
+            os.link(staging, path)
+        except FileExistsError:
+            pass
+        finally:
+            staging.unlink(missing_ok=True)
+    try:
+        return int(path.read_text()) == total
+    except FileNotFoundError:  # expired meanwhile
+        return True
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """Request body, or HTTP 413 as soon as it grows past limit bytes."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail="Upload piece is too large")
+    return bytes(body)
+
+
+def _read_head(path: Path, size: int) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or adjacent inclusive byte ranges."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _read_ranges(path: Path) -> List[Tuple[int, int]]:
+    """Byte ranges recorded in an upload's .ranges file, merged."""
+    try:
+        lines = path.read_text().split()
+    except FileNotFoundError:
+        return []
+    return _merge_ranges([tuple(int(v) for v in line.split("-")) for line in lines])
+
+
+def _record_range(path: Path, start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    Append a received byte range and return all received ranges, merged.
+
+    Each line is one O_APPEND write, so pieces handled by different
+    workers can record their ranges without a lock.
+    """
+    with open(path, "a") as f:
+        f.write(f"{start}-{end}\n")
+    return _read_ranges(path)
+
+
+def _claim_upload(partial_path: Path, claimed_path: Path) -> bool:
+    """
+    Take over a complete upload for finalization.
+
+    The rename is atomic across processes: when two workers both see the
+    last range arrive, only one gets True.
+    """
+    try:
+        os.rename(partial_path, claimed_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _expire_partial_uploads(now: float) -> None:
+    """Delete pieces and bookkeeping of uploads idle for _PARTIAL_UPLOAD_TTL."""
+    for path in _PARTIAL_UPLOAD_DIR.iterdir():
+        try:
+            if now - path.stat().st_mtime > _PARTIAL_UPLOAD_TTL:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+_next_partial_sweep = 0.0
+
+
+@app.put("/upload-chunk")
+async def upload_pdf_chunk(
+    request: Request,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    semantic_cache: SemanticCache = Depends(_semantic_cache)
+):
+    """
+    Upload a PDF in pieces and create a vector store once it is complete
+    
+    The raw request body is one piece of the file. Headers:
+    
+    - **Content-Range**: `bytes <start>-<end>/<total>` position of the piece
+    - **X-Upload-Id**: Client-chosen id shared by all pieces of one file
+    - **X-Filename**: URL-encoded file name
+    - **X-Vectorstore-Name**: Optional name for the vector store (default: "default")
+    
+    Pieces are written at their offset and may arrive in any order or
+    in parallel, also at different workers; a failed piece can simply be
+    sent again. The piece that completes the file finalizes the upload
+    and returns the same response as /upload; other pieces return the
+    number of bytes received so far. GET /upload-chunk/{upload_id} lists
+    the received ranges for resuming. Uploads left unfinished for
+    _PARTIAL_UPLOAD_TTL are deleted.
+    """
+    global _next_partial_sweep
+    upload_id = request.headers.get("x-upload-id", "")
+    match = _CONTENT_RANGE_RE.match(request.headers.get("content-range", ""))
+    if not _UPLOAD_ID_RE.match(upload_id) or match is None:
+        raise HTTPException(
+            status_code=400,
+            detail="X-Upload-Id and Content-Range (bytes start-end/total) headers are required"
+        )
+    
+    start, end, total = (int(value) for value in match.groups())
+    if end < start or end >= total:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range")
+    if total > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Files are limited to {MAX_UPLOAD_BYTES} bytes")
+    if end - start + 1 > _MAX_UPLOAD_PIECE:
+        raise HTTPException(status_code=413, detail=f"Pieces are limited to {_MAX_UPLOAD_PIECE} bytes")
+    filename = _pdf_filename(unquote(request.headers.get("x-filename", f"{upload_id}.pdf")))
+    data = await _read_body(request, end - start + 1)
+    if len(data) != end - start + 1:
+        raise HTTPException(status_code=400, detail="Content-Range does not match the body")
+    
+    _PARTIAL_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    if now >= _next_partial_sweep:
+        _next_partial_sweep = now + _PARTIAL_SWEEP_INTERVAL
+        await asyncio.to_thread(_expire_partial_uploads, now)
+    
+    partial_path = _PARTIAL_UPLOAD_DIR / upload_id
+    ranges_path = _PARTIAL_UPLOAD_DIR / f"{upload_id}.ranges"
+    claimed_path = _PARTIAL_UPLOAD_DIR / f"{upload_id}.claimed"
+    total_path = _PARTIAL_UPLOAD_DIR / f"{upload_id}.total"
+    if not await asyncio.to_thread(_check_upload_total, total_path, total):
+        raise HTTPException(
+            status_code=400, detail="Content-Range total differs from earlier pieces of this upload"
+        )
+    
+    # Pieces are written concurrently; a range is only recorded once its
+    # bytes are in the file
+    await asyncio.to_thread(_write_chunk, partial_path, start, data)
+    ranges = await asyncio.to_thread(_record_range, ranges_path, start, end)
+    if ranges != [(0, total - 1)]:
+        received = sum(range_end - range_start + 1 for range_start, range_end in ranges)
+        return {"received": received, "total": total}
+    if not await asyncio.to_thread(_claim_upload, partial_path, claimed_path):
+        # Another piece (possibly in another worker) is finalizing it
+        return {"received": total, "total": total}
+    
+    # File complete: validate, move into place and process like /upload
+    ranges_path.unlink(missing_ok=True)
+    total_path.unlink(missing_ok=True)
+    if await asyncio.to_thread(_read_head, claimed_path, len(_PDF_MAGIC)) != _PDF_MAGIC:
+        claimed_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    
+    vectorstore_name = request.headers.get("x-vectorstore-name", "default")
+    try:
+        file_path = Path(UPLOAD_DIR) / filename
+        await asyncio.to_thread(os.replace, claimed_path, file_path)
         
-        # Get document count
-        num_chunks = vectorstore.index.ntotal if vectorstore else 0
+        logger.info("Uploaded file in chunks: %s", filename)
         
-        return UploadResponse(
-            success=True,
-            message=f"PDF processed successfully. Vector store '{vectorstore_name}' created.",
-            filename=file.filename,
-            vectorstore_name=vectorstore_name,
-            num_chunks=num_chunks
+        return await _ingest_pdf(
+            file_path, filename, vectorstore_name, rag_pipeline, semantic_cache
         )
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
 
 
+@app.get("/upload-chunk/{upload_id}")
+async def upload_chunk_status(upload_id: str):
+    """
+    Byte ranges received so far for a chunked upload
+    
+    Lets a client resume an interrupted upload by sending only the
+    missing pieces. Unknown ids report no ranges.
+    """
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise HTTPException(status_code=400, detail="Invalid upload id")
+    
+    ranges = await asyncio.to_thread(
+        _read_ranges, _PARTIAL_UPLOAD_DIR / f"{upload_id}.ranges"
+    )
+    return {"ranges": [list(range_) for range_ in ranges]}
+
+
+def _json_response(model: BaseModel) -> ORJSONResponse:
+    """
+    Serialize an already-built response model straight through orjson.
+
+    FastAPI skips its response_model pass for Response return values,
+    which would otherwise validate the model a second time before
+    dumping it; response_model stays on the route for the OpenAPI schema.
+    """
+    return ORJSONResponse(model.model_dump())
+
+
+async def _answer_question(
+    request: QuestionRequest,
+    rag_pipeline: RAGPipeline,
+    retrieval_service: RetrievalService,
+    semantic_cache: SemanticCache,
+) -> Dict[str, Any]:
+    """
+    Answer a question, serving near-duplicates from the semantic cache.
+
+    The embedding call and cache I/O run in worker threads; the LLM call
+    is awaited on the event loop, so it holds no thread while it runs.
+    """
+    namespace = cache_namespace(
+        rag_pipeline.vectorstore_name, request.k, request.include_sources
+    )
+
+    def lookup() -> Tuple[Any, Optional[Dict[str, Any]]]:
+        question_vector = rag_pipeline.embeddings.embed_query(request.question)
+        return question_vector, semantic_cache.lookup(namespace, question_vector)
+
+    question_vector, cached = await asyncio.to_thread(lookup)
+    if cached is not None:
+        cached["question"] = request.question
+        return cached
+
+    # Get answer from retrieval service
+    result = await retrieval_service.ask_async(
+        question=request.question,
+        k=request.k,
+        include_sources=request.include_sources
+    )
+    await asyncio.to_thread(semantic_cache.add, namespace, question_vector, result)
+    return result
+
+
 @app.post("/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
+async def ask_question(
+    request: QuestionRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    retrieval_service: RetrievalService = Depends(_retrieval_service),
+    semantic_cache: SemanticCache = Depends(_semantic_cache)
+):
     """
     Ask a question about the uploaded document
     
@@ -203,14 +689,12 @@ async def ask_question(request: QuestionRequest):
                 detail="No document loaded. Please upload a PDF first using /upload endpoint."
             )
         
-        # Get answer from retrieval service
-        result = retrieval_service.ask(
-            question=request.question,
-            k=request.k,
-            include_sources=request.include_sources
+        result = await _answer_question(
+            request, rag_pipeline, retrieval_service, semantic_cache
         )
         
-        return QuestionResponse(**result)
+        # Built by our own retrieval service, so skip re-validating it here
+        return _json_response(QuestionResponse.model_construct(**result))
     
     except HTTPException:
         raise
@@ -218,15 +702,136 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
 
+def _sse_event(event: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Events message."""
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+def _stream_answer(
+    request: QuestionRequest,
+    rag_pipeline: RAGPipeline,
+    retrieval_service: RetrievalService,
+    semantic_cache: SemanticCache,
+) -> Iterator[bytes]:
+    """
+    SSE stream of an answer: a meta event, token events, then done.
+
+    A sync generator, driven from a worker thread by _iterate_in_thread
+    so the blocking Gemini stream never runs on the event loop. Errors
+    after the stream has started are reported as an error event, since
+    the status code has already been sent.
+    """
+    try:
+        namespace = cache_namespace(
+            rag_pipeline.vectorstore_name, request.k, request.include_sources
+        )
+        question_vector = rag_pipeline.embeddings.embed_query(request.question)
+        cached = semantic_cache.lookup(namespace, question_vector)
+        if cached is not None:
+            answer = cached.pop("answer")
+            cached["question"] = request.question
+            yield _sse_event({"type": "meta", **cached})
+            yield _sse_event({"type": "token", "text": answer})
+            yield _sse_event({"type": "done"})
+            return
+
+        result: Dict[str, Any] = {}
+        tokens: List[str] = []
+        for event in retrieval_service.ask_stream(
+            question=request.question,
+            k=request.k,
+            include_sources=request.include_sources
+        ):
+            if event["type"] == "token":
+                tokens.append(event["text"])
+            else:
+                result = {key: value for key, value in event.items() if key != "type"}
+            yield _sse_event(event)
+
+        result["answer"] = "".join(tokens)
+        semantic_cache.add(namespace, question_vector, result)
+        yield _sse_event({"type": "done"})
+    except Exception as e:
+        yield _sse_event({"type": "error", "detail": f"Error answering question: {str(e)}"})
+
+
+async def _iterate_in_thread(iterator: Generator[bytes, None, None]) -> AsyncIterator[bytes]:
+    """
+    Drive a blocking iterator from a single worker thread.
+
+    StreamingResponse would dispatch each next() of a sync iterator to
+    the threadpool separately, a thread hop per token. Here one thread
+    runs the whole iterator and hands items over through an asyncio
+    queue. If the client disconnects, this generator is closed and the
+    worker stops (closing the iterator) after its current item; closing
+    waits for that, and an exception from the iterator is re-raised.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    finished = object()
+
+    def drain() -> None:
+        try:
+            for item in iterator:
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        finally:
+            iterator.close()
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    worker = loop.run_in_executor(None, drain)
+    try:
+        while (item := await queue.get()) is not finished:
+            yield item
+    finally:
+        stopped.set()
+        # Wait for the worker to stop so its errors are raised here
+        await worker
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(
+    request: QuestionRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    retrieval_service: RetrievalService = Depends(_retrieval_service),
+    semantic_cache: SemanticCache = Depends(_semantic_cache)
+):
+    """
+    Ask a question and receive the answer as Server-Sent Events
+    
+    Same parameters as /ask. Events are JSON objects with a "type" of
+    meta (question, model, sources), token (a piece of the answer),
+    done, or error.
+    """
+    if rag_pipeline.vectorstore is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No document loaded. Please upload a PDF first using /upload endpoint."
+        )
+    
+    return StreamingResponse(
+        _iterate_in_thread(
+            _stream_answer(request, rag_pipeline, retrieval_service, semantic_cache)
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/load-vectorstore")
-async def load_existing_vectorstore(vectorstore_name: str = Form(default="default")):
+async def load_existing_vectorstore(
+    vectorstore_name: str = Form(default="default"),
+    retrieval_service: RetrievalService = Depends(_retrieval_service)
+):
     """
     Load an existing vector store
     
     - **vectorstore_name**: Name of the vector store to load
     """
     try:
-        retrieval_service.load_vectorstore(vectorstore_name)
+        await asyncio.to_thread(retrieval_service.load_vectorstore, vectorstore_name)
         return {
             "success": True,
             "message": f"Vector store '{vectorstore_name}' loaded successfully"
@@ -240,8 +845,40 @@ async def load_existing_vectorstore(vectorstore_name: str = Form(default="defaul
         raise HTTPException(status_code=500, detail=f"Error loading vector store: {str(e)}")
 
 
+async def _build_study_plan(
+    request: StudyPlanRequest, study_plan_generator: StudyPlanGenerator
+) -> StudyPlanResponse:
+    """Generate and validate a study plan."""
+    plan_dict = await study_plan_generator.generate_plan_async(
+        days=request.days,
+        daily_minutes=request.daily_minutes,
+        focus=request.focus,
+    )
+
+    # Ensure required fields exist
+    plan_dict.setdefault("total_days", request.days)
+    plan_dict.setdefault("daily_minutes", request.daily_minutes)
+
+    return StudyPlanResponse(**plan_dict)
+
+
+async def _build_quiz(request: QuizRequest, quiz_generator: QuizGenerator) -> QuizResponse:
+    """Generate and validate a quiz."""
+    quiz_dict = await quiz_generator.generate_quiz_async(
+        quiz_type=request.quiz_type,
+        num_questions=request.num_questions,
+        difficulty=request.difficulty,
+        topic=request.topic,
+    )
+    return QuizResponse(**quiz_dict)
+
+
 @app.post("/study-plan", response_model=StudyPlanResponse)
-async def generate_study_plan(request: StudyPlanRequest):
+async def generate_study_plan(
+    request: StudyPlanRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    study_plan_generator: StudyPlanGenerator = Depends(_study_plan_generator)
+):
     """
     Generate a study plan based on the uploaded document and user preferences.
     """
@@ -253,25 +890,98 @@ async def generate_study_plan(request: StudyPlanRequest):
                 detail="No document loaded. Please upload a PDF first using /upload endpoint."
             )
 
-        plan_dict = study_plan_generator.generate_plan(
+        plan = await _build_study_plan(request, study_plan_generator)
+        return _json_response(plan)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating study plan: {str(e)}")
+
+
+async def _stream_study_plan(
+    request: StudyPlanRequest, study_plan_generator: StudyPlanGenerator
+) -> AsyncIterator[bytes]:
+    """Encode study plan stream events as NDJSON lines, validating the final plan."""
+    try:
+        async for event in study_plan_generator.generate_plan_stream(
             days=request.days,
             daily_minutes=request.daily_minutes,
             focus=request.focus,
+        ):
+            if event["type"] == "plan":
+                plan_dict = event["plan"]
+                plan_dict.setdefault("total_days", request.days)
+                plan_dict.setdefault("daily_minutes", request.daily_minutes)
+                event["plan"] = StudyPlanResponse(**plan_dict).model_dump()
+            yield orjson.dumps(event) + b"\n"
+    except Exception as e:
+        yield orjson.dumps({"type": "error", "detail": f"Error generating study plan: {str(e)}"}) + b"\n"
+
+
+@app.post("/study-plan/stream")
+async def generate_study_plan_stream(
+    request: StudyPlanRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    study_plan_generator: StudyPlanGenerator = Depends(_study_plan_generator)
+):
+    """
+    Generate a study plan and receive its days as they are written
+    
+    Same parameters as /study-plan. The body is newline-delimited JSON:
+    {"type": "day"} lines carrying a preview of each day as soon as the
+    model has finished it, then one {"type": "plan"} line with the
+    validated plan, or {"type": "error"}.
+    """
+    if rag_pipeline.vectorstore is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No document loaded. Please upload a PDF first using /upload endpoint."
         )
+    
+    return StreamingResponse(
+        _stream_study_plan(request, study_plan_generator),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        # Ensure required fields exist
-        plan_dict.setdefault("total_days", request.days)
-        plan_dict.setdefault("daily_minutes", request.daily_minutes)
 
-        return StudyPlanResponse(**plan_dict)
+@app.post("/plans/batch", response_model=StudyPlanBatchResponse)
+async def generate_study_plans_batch(
+    request: StudyPlanBatchRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    study_plan_generator: StudyPlanGenerator = Depends(_study_plan_generator)
+):
+    """
+    Generate several study plans (e.g. 3- and 7-day) in one request.
+    
+    The plans share one retrieved context and, where possible, a single
+    Gemini call; results are in request order.
+    """
+    try:
+        # Check if vectorstore is loaded
+        if rag_pipeline.vectorstore is None:
+            raise HTTPException(
+                status_code=400,
+                detail="No document loaded. Please upload a PDF first using /upload endpoint."
+            )
+
+        plan_dicts = await study_plan_generator.generate_plans_batch(
+            [(plan.days, plan.daily_minutes, plan.focus) for plan in request.plans]
+        )
+        plans = [StudyPlanResponse(**plan_dict) for plan_dict in plan_dicts]
+        return _json_response(StudyPlanBatchResponse(plans=plans))
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating study plan: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating study plans: {str(e)}")
 
 
 @app.post("/generate-quiz", response_model=QuizResponse)
-async def generate_quiz(request: QuizRequest):
+async def generate_quiz(
+    request: QuizRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    quiz_generator: QuizGenerator = Depends(_quiz_generator)
+):
     """
     Generate a quiz based on the uploaded document.
     
@@ -288,26 +998,108 @@ async def generate_quiz(request: QuizRequest):
                 detail="No document loaded. Please upload a PDF first using /upload endpoint."
             )
 
-        quiz_dict = quiz_generator.generate_quiz(
+        quiz = await _build_quiz(request, quiz_generator)
+        return _json_response(quiz)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
+
+
+async def _stream_quiz(request: QuizRequest, quiz_generator: QuizGenerator) -> AsyncIterator[bytes]:
+    """Encode quiz stream events as NDJSON lines, validating the final quiz."""
+    try:
+        async for event in quiz_generator.generate_quiz_stream(
             quiz_type=request.quiz_type,
             num_questions=request.num_questions,
             difficulty=request.difficulty,
             topic=request.topic,
+        ):
+            if event["type"] == "quiz":
+                event["quiz"] = QuizResponse(**event["quiz"]).model_dump()
+            yield orjson.dumps(event) + b"\n"
+    except Exception as e:
+        yield orjson.dumps({"type": "error", "detail": f"Error generating quiz: {str(e)}"}) + b"\n"
+
+
+@app.post("/generate-quiz/stream")
+async def generate_quiz_stream(
+    request: QuizRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    quiz_generator: QuizGenerator = Depends(_quiz_generator)
+):
+    """
+    Generate a quiz and receive its questions as they are written
+    
+    Same parameters as /generate-quiz. The body is newline-delimited
+    JSON: {"type": "question"} lines carrying a preview of each question
+    as soon as the model has finished it, then one {"type": "quiz"} line
+    with the validated quiz (renumbered, with its answer key), or
+    {"type": "error"}.
+    """
+    if rag_pipeline.vectorstore is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No document loaded. Please upload a PDF first using /upload endpoint."
         )
+    
+    return StreamingResponse(
+        _stream_quiz(request, quiz_generator),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-        return QuizResponse(**quiz_dict)
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
+
+@app.post("/batch", response_model=BatchResponse)
+async def run_batch(
+    request: BatchRequest,
+    rag_pipeline: RAGPipeline = Depends(_rag_pipeline),
+    retrieval_service: RetrievalService = Depends(_retrieval_service),
+    study_plan_generator: StudyPlanGenerator = Depends(_study_plan_generator),
+    quiz_generator: QuizGenerator = Depends(_quiz_generator),
+    semantic_cache: SemanticCache = Depends(_semantic_cache)
+):
+    """
+    Run several ask / plan / quiz operations in one request.
+    
+    Operations run concurrently; each takes the same fields as its own
+    endpoint plus an "op" tag. A failing operation is reported in its
+    result slot and doesn't fail the others.
+    """
+    if rag_pipeline.vectorstore is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No document loaded. Please upload a PDF first using /upload endpoint."
+        )
+
+    async def run(op) -> BatchResult:
+        try:
+            if isinstance(op, AskOperation):
+                result = await _answer_question(
+                    op, rag_pipeline, retrieval_service, semantic_cache
+                )
+            elif isinstance(op, StudyPlanOperation):
+                plan = await _build_study_plan(op, study_plan_generator)
+                result = plan.model_dump()
+            else:
+                quiz = await _build_quiz(op, quiz_generator)
+                result = quiz.model_dump()
+            return BatchResult(op=op.op, ok=True, result=result)
+        except Exception as e:
+            return BatchResult(op=op.op, ok=False, detail=str(e))
+
+    results = await asyncio.gather(*(run(op) for op in request.ops))
+    return _json_response(BatchResponse(results=list(results)))
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(rag_pipeline: RAGPipeline = Depends(_rag_pipeline)):
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "vectorstore_loaded": rag_pipeline.vectorstore is not None
+        "vectorstore_loaded": rag_pipeline.vectorstore is not None,
+        "query_embedding_cache": query_cache_info(),
+        "llm_cache": get_llm_cache().info()
     }
 
 
@@ -5,20 +5,236 @@ Generates quizzes (multiple choice, true/false, open-ended) based on PDF content
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import os
-from typing import Any, Dict, List, Optional, Literal
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Literal, Tuple
 
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
+import fastjsonschema
+import orjson
 
-from backend.config import GOOGLE_API_KEY, LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS
-from backend.retrieval_service import get_retrieval_service
+from backend.config import LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS
+from backend.json_stream import JSONArrayItemStream
+from backend.llm_cache import get_llm_cache
+from backend.llm_client import get_llm_model
+from backend.retrieval_service import RetrievedBatch, get_retrieval_service
 
 
 QuizType = Literal["multiple_choice", "true_false", "open_ended", "mixed"]
 DifficultyLevel = Literal["easy", "medium", "hard"]
 
+# A ```json ... ``` markdown fence the model sometimes wraps its reply in
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# Shape of a quiz reply, as described to the model in the prompt. Fields
+# whose default depends on the request (quiz_type, difficulty, ...) and
+# the answer key are filled in by _finalize_quiz instead.
+QUIZ_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": ["questions"],
+    "properties": {
+        "quiz_type": {"type": "string"},
+        "difficulty": {"type": "string"},
+        "num_questions": {"type": "integer"},
+        "topic": {"type": ["string", "null"]},
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["id", "type", "question", "correct_answer"],
+                "properties": {
+                    "id": {"type": "integer"},
+                    "type": {"type": "string"},
+                    "question": {"type": "string"},
+                    "choices": {
+                        "type": ["array", "null"],
+                        "items": {"type": "string"},
+                        "default": None,
+                    },
+                    "correct_answer": {"type": "string"},
+                    "explanation": {"type": "string", "default": ""},
+                    "source_page": {"type": ["integer", "null"], "default": None},
+                },
+            },
+        },
+        "answer_key": {
+            "type": "object",
+            "additionalProperties": {"type": "string"},
+        },
+    },
+}
+
+
+# Per-type and per-difficulty prompt sections; fixed text, built once
+_QUIZ_TYPE_INSTR: Dict[str, str] = {
+    "multiple_choice": """
+ÇOKTAN SEÇMELİ SORULAR İÇİN:
+- Her soru için 4 şık oluştur (A, B, C, D)
+- Sadece bir doğru cevap olsun
+- Yanlış şıklar mantıklı ama yanlış olsun (çeldirici)
+- choices: ["A) ...", "B) ...", "C) ...", "D) ..."]
+- correct_answer: sadece harf (örn: "A")
+""",
+    "true_false": """
+DOĞRU-YANLIŞ SORULARI İÇİN:
+- Açık ve net ifadeler yaz
+- Belirsiz ifadelerden kaçın
+- choices: ["Doğru", "Yanlış"]
+- correct_answer: "Doğru" veya "Yanlış"
+""",
+    "open_ended": """
+AÇIK UÇLU SORULAR İÇİN:
+- Düşünmeye ve açıklamaya teşvik eden sorular sor
+- choices: null (şık yok)
+- correct_answer: beklenen cevabın özeti
+""",
+    "mixed": """
+KARMA QUIZ İÇİN:
+- Farklı türlerde sorular karıştır
+- Çoktan seçmeli, doğru-yanlış ve açık uçlu sorular ekle
+- Her sorunun type alanını doğru belirt
+"""
+}
+
+_DIFF_INSTR: Dict[str, str] = {
+    "easy": """
+KOLAY SEVİYE:
+- Temel kavram ve tanım soruları
+- Doğrudan metinde geçen bilgiler
+- Karmaşık hesaplama veya analiz gerektirmeyen sorular
+""",
+    "medium": """
+ORTA SEVİYE:
+- Kavramları anlama ve uygulama soruları
+- Birden fazla bilgiyi birleştirmeyi gerektiren sorular
+- Temel düzeyde analiz gerektiren sorular
+""",
+    "hard": """
+ZOR SEVİYE:
+- Analiz ve sentez gerektiren sorular
+- Kavramlar arası ilişkileri sorgulayan sorular
+- Eleştirel düşünme gerektiren sorular
+- Verilen bilgiyi farklı bağlamlara uygulamayı gerektiren sorular
+"""
+}
+
+# Queries covering the notes as a whole, for quizzes without a topic
+_OVERVIEW_QUERIES = (
+    "Bu ders notlarının ana konuları ve önemli kavramları nelerdir?",
+    "Ders notlarındaki temel tanımlar nelerdir?",
+    "Ders notlarında anlatılan kurallar, formüller ve ilkeler nelerdir?",
+    "Ders notlarındaki örnekler ve uygulamalar nelerdir?",
+)
+
+# Quiz generation prompt; filled with a single %-format per request
+_QUIZ_PROMPT = """Sen bir eğitim uzmanı ve sınav hazırlayıcısısın.
+Görevin, verilen ders notu BAĞLAMINA göre quiz soruları üretmek.
+
+BAĞLAM (ders notlarından alınmış parçalar):
+%(context)s
+
+QUIZ PARAMETRELERİ:
+- Quiz türü: %(quiz_type)s
+- Soru sayısı: %(num_questions)s
+- Zorluk seviyesi: %(difficulty)s
+- Özel konu odağı: %(topic)s
+
+%(quiz_type_instructions)s
+
+%(difficulty_instructions)s
+
+TALİMATLAR:
+1. Sadece verilen bağlamdaki bilgilere göre soru sor
+2. Her sorunun açık ve anlaşılır olmasını sağla
+3. Doğru cevabı ve kısa bir açıklama ekle
+4. Kaynak sayfa numarasını belirt (context'ten)
+5. Türkçe olarak yaz
+
+SADECE AŞAĞIDAKİ JSON ŞEMASINA UYAN GEÇERLİ BİR JSON DÖNDÜR.
+Açıklama veya markdown yazma, sadece JSON.
+
+JSON ŞEMASI:
+{
+  "quiz_type": "%(quiz_type)s",
+  "difficulty": "%(difficulty)s",
+  "num_questions": %(num_questions)s,
+  "topic": str veya null,
+  "questions": [
+    {
+      "id": int,                    // 1, 2, 3...
+      "type": str,                  // "multiple_choice", "true_false", "open_ended"
+      "question": str,              // Soru metni
+      "choices": [str, ...] | null, // Şıklar (açık uçlu için null)
+      "correct_answer": str,        // Doğru cevap
+      "explanation": str,           // Kısa açıklama
+      "source_page": int            // Kaynak sayfa numarası
+    }
+  ],
+  "answer_key": {                  // Cevap anahtarı
+    "1": str,
+    "2": str,
+    ...
+  }
+}
+"""
+
+
+# First run of digits in a page reference such as "Sayfa 5" or "5-6"
+_PAGE_NUMBER_RE = re.compile(r"\d+")
+
+
+def _coerce_question_types(data: Any) -> Any:
+    """
+    Fix the JSON types models commonly get wrong, before schema validation.
+
+    source_page given as "5", "Sayfa 5" or 5.0 becomes the int 5 (None if
+    it holds no number), and numeric or boolean correct answers become
+    strings. Replies that aren't a dict of question dicts are returned
+    unchanged for the validator to reject.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("questions"), list):
+        return data
+
+    for question in data["questions"]:
+        if not isinstance(question, dict):
+            continue
+        page = question.get("source_page")
+        if isinstance(page, float):
+            question["source_page"] = int(page)
+        elif isinstance(page, str):
+            match = _PAGE_NUMBER_RE.search(page)
+            question["source_page"] = int(match.group()) if match else None
+        answer = question.get("correct_answer")
+        if isinstance(answer, bool):
+            question["correct_answer"] = "Doğru" if answer else "Yanlış"
+        elif isinstance(answer, (int, float)):
+            question["correct_answer"] = str(answer)
+    return data
+
+
+@functools.lru_cache(maxsize=32)
+def _prompt_template(quiz_type: str, num_questions: int, difficulty: str) -> str:
+    """
+    _QUIZ_PROMPT with every field but context and topic filled in.
+
+    Only a handful of (type, count, difficulty) combinations occur, so
+    each request's prompt is a two-field format of a cached template.
+    """
+    fixed = {
+        "quiz_type": quiz_type,
+        "num_questions": num_questions,
+        "difficulty": difficulty,
+        "quiz_type_instructions": _QUIZ_TYPE_INSTR.get(quiz_type, _QUIZ_TYPE_INSTR["multiple_choice"]),
+        "difficulty_instructions": _DIFF_INSTR.get(difficulty, _DIFF_INSTR["medium"]),
+    }
+    # The result is %-formatted again: escape what was filled, keep the two open slots
+    fields = {name: str(value).replace("%", "%%") for name, value in fixed.items()}
+    return _QUIZ_PROMPT % dict(fields, context="%(context)s", topic="%(topic)s")
+
 
 class QuizGenerator:
     """
@@ -32,18 +248,25 @@ class QuizGenerator:
 
         if self.use_mock_llm:
             self.model = None
+            # Errors that fall back to a mock quiz
+            self._gemini_errors: Tuple[type, ...] = (asyncio.TimeoutError,)
             print("✓ QuizGenerator initialized in MOCK LLM mode (no Google LLM calls)")
         else:
-            # Configure Gemini
-            genai.configure(api_key=GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel(LLM_MODEL)
+            # Imported here so MOCK mode never loads google.api_core / grpc
+            from google.api_core import exceptions as google_exceptions
+
+            self._gemini_errors = (google_exceptions.GoogleAPIError, asyncio.TimeoutError)
+            self.model = get_llm_model()
             print(f"✓ QuizGenerator initialized with model: {LLM_MODEL}")
 
         self.retrieval_service = get_retrieval_service()
+        self.llm_cache = get_llm_cache()
         self.generation_config = {
             "temperature": TEMPERATURE,
             "max_output_tokens": MAX_TOKENS,
         }
+        # Compiled once to Python code; fills in the schema defaults
+        self._validate_quiz = fastjsonschema.compile(QUIZ_SCHEMA, use_default=True)
 
     def _build_mock_quiz(
         self,
@@ -116,6 +339,186 @@ class QuizGenerator:
             "note": "Bu quiz MOCK modunda üretilmiştir."
         }
 
+    def _cache_key(
+        self,
+        quiz_type: QuizType,
+        num_questions: int,
+        difficulty: DifficultyLevel,
+        topic: Optional[str],
+    ) -> str:
+        """LLM cache key of a quiz request against the loaded vectorstore."""
+        return self.llm_cache.make_key(
+            kind="quiz",
+            quiz_type=quiz_type,
+            num_questions=num_questions,
+            difficulty=difficulty,
+            topic=topic,
+            model=LLM_MODEL,
+            vectorstore=self.retrieval_service.rag_pipeline.vectorstore_name,
+            **self.generation_config,
+        )
+
+    def _retrieve_context(self, topic: Optional[str]) -> str:
+        """Retrieve the note excerpts a quiz is generated from."""
+        # Ensure we have a vector store loaded
+        if self.retrieval_service.rag_pipeline.vectorstore is None:
+            raise ValueError(
+                "No vector store loaded. Please upload a PDF first using /upload endpoint."
+            )
+
+        # Retrieve context from notes
+        if topic:
+            documents = self.retrieval_service.retrieve_documents(
+                query=topic,
+                k=TOP_K_RESULTS * 2,
+            )
+            return self.retrieval_service.build_context_from_docs(documents)
+
+        # No topic: one generic query keeps returning overlapping chunks, so
+        # several angles on the notes are searched in one batch and merged
+        # round-robin, each chunk once
+        per_query = self.retrieval_service.retrieve_documents_batch(
+            list(_OVERVIEW_QUERIES), k=TOP_K_RESULTS
+        )
+        documents = RetrievedBatch.interleave(per_query, TOP_K_RESULTS * 2)
+        return self.retrieval_service.build_context_from_docs(documents)
+
+    def _build_prompt(
+        self,
+        context: str,
+        quiz_type: QuizType,
+        num_questions: int,
+        difficulty: DifficultyLevel,
+        topic: Optional[str],
+    ) -> str:
+        """Build the quiz generation prompt for the given parameters."""
+        return _prompt_template(quiz_type, num_questions, difficulty) % {
+            "context": context,
+            "topic": topic or "belirtilmedi (tüm içerikten sor)",
+        }
+
+    def _parse_quiz(self, raw_text: str) -> Dict[str, Any]:
+        """
+        Parse the model's JSON reply and check it against QUIZ_SCHEMA.
+
+        Raises:
+            json.JSONDecodeError: If the reply is not valid JSON
+                (orjson.JSONDecodeError subclasses it)
+            fastjsonschema.JsonSchemaException: If it doesn't match the schema
+        """
+        # Strip potential markdown formatting in one pass
+        data = _coerce_question_types(orjson.loads(_FENCE_RE.sub("", raw_text)))
+        return self._validate_quiz(data)
+
+    @staticmethod
+    def _finalize_quiz(
+        data: Dict[str, Any],
+        quiz_type: QuizType,
+        num_questions: int,
+        difficulty: DifficultyLevel,
+    ) -> Dict[str, Any]:
+        """Fill in the request-dependent fields the model may have left out."""
+        # Ensure required fields exist
+        data.setdefault("quiz_type", quiz_type)
+        data.setdefault("difficulty", difficulty)
+        data.setdefault("num_questions", num_questions)
+
+        # Build answer key if not provided
+        if "answer_key" not in data:
+            data["answer_key"] = {
+                str(q["id"]): q.get("correct_answer", "")
+                for q in data["questions"]
+            }
+
+        return data
+
+    @staticmethod
+    def _split_quiz(quiz_type: QuizType, num_questions: int) -> List[Tuple[QuizType, int]]:
+        """
+        The (type, count) sub-quizzes a quiz is requested as.
+
+        A mixed quiz becomes one sub-quiz per question type, with counts
+        dealt round-robin like the mock quiz does; types that get no
+        question are left out. Other quizzes are a single request.
+        """
+        if quiz_type != "mixed":
+            return [(quiz_type, num_questions)]
+        types: List[QuizType] = ["multiple_choice", "true_false", "open_ended"]
+        counts = [len(range(i, num_questions, len(types))) for i in range(len(types))]
+        return [(q_type, count) for q_type, count in zip(types, counts) if count]
+
+    def _llm_error_quiz(
+        self,
+        exc: Exception,
+        quiz_type: QuizType,
+        num_questions: int,
+        difficulty: DifficultyLevel,
+        topic: Optional[str],
+    ) -> Dict[str, Any]:
+        """Log a failed Gemini call and fall back to a mock quiz."""
+        if isinstance(exc, self._gemini_errors):
+            print(
+                f"⚠️ QuizGenerator Gemini error ({type(exc).__name__}): {exc}. "
+                "Falling back to MOCK quiz."
+            )
+        else:  # pragma: no cover - defensive
+            print(
+                f"⚠️ Unexpected QuizGenerator error ({type(exc).__name__}): {exc}. "
+                "Falling back to MOCK quiz."
+            )
+        return self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
+
+    def _assemble_quiz(
+        self,
+        raw_texts: List[str],
+        parts: List[Tuple[QuizType, int]],
+        quiz_type: QuizType,
+        num_questions: int,
+        difficulty: DifficultyLevel,
+        topic: Optional[str],
+    ) -> Dict[str, Any]:
+        """
+        Parse the replies to each sub-quiz prompt into one quiz.
+
+        Sub-quiz questions are concatenated in order, renumbered and
+        stamped with their sub-quiz's type; the answer key is rebuilt
+        from the merged questions. Any unusable reply makes the whole
+        quiz fall back to a mock one, with a note saying why.
+        """
+        # Parse JSON responses
+        parsed = []
+        for raw_text in raw_texts:
+            try:
+                parsed.append(self._parse_quiz(raw_text))
+            except json.JSONDecodeError:
+                # Fallback: return mock quiz with error note
+                mock_data = self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
+                mock_data["note"] = f"Model geçerli JSON döndüremedi. Raw response: {raw_text[:500]}"
+                return mock_data
+            except fastjsonschema.JsonSchemaException as exc:
+                mock_data = self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
+                mock_data["note"] = f"Model quiz şemasına uymayan JSON döndürdü ({exc}). Raw response: {raw_text[:500]}"
+                return mock_data
+
+        if len(parsed) == 1:
+            return self._finalize_quiz(parsed[0], quiz_type, num_questions, difficulty)
+
+        questions = []
+        for (part_type, _), part in zip(parts, parsed):
+            for question in part["questions"]:
+                question["type"] = part_type
+                questions.append(question)
+        for q_id, question in enumerate(questions, start=1):
+            question["id"] = q_id
+        data = {
+            "quiz_type": quiz_type,
+            "difficulty": difficulty,
+            "num_questions": len(questions),
+            "topic": parsed[0].get("topic", topic),
+            "questions": questions,
+        }
+        return self._finalize_quiz(data, quiz_type, num_questions, difficulty)
+
     def generate_quiz(
         self,
         quiz_type: QuizType = "multiple_choice",
@@ -126,6 +529,9 @@ class QuizGenerator:
         """
         Generate a quiz based on the uploaded document.
 
+        A mixed quiz is requested as one smaller prompt per question type;
+        those calls run concurrently in worker threads.
+
         Args:
             quiz_type: Type of quiz - multiple_choice, true_false, open_ended, or mixed
             num_questions: Number of questions to generate (1-20)
@@ -135,191 +541,191 @@ class QuizGenerator:
         Returns:
             Dict containing quiz questions and answer key
         """
-        # Ensure we have a vector store loaded
-        if self.retrieval_service.rag_pipeline.vectorstore is None:
-            raise ValueError(
-                "No vector store loaded. Please upload a PDF first using /upload endpoint."
-            )
-
-        # Retrieve context from notes
-        query = topic or "Bu ders notlarının ana konuları ve önemli kavramları nelerdir?"
-        documents = self.retrieval_service.retrieve_documents(
-            query=query,
-            k=TOP_K_RESULTS * 2,
-        )
-        context = self.retrieval_service.build_context_from_docs(documents)
+        context = self._retrieve_context(topic)
 
         # If we are in MOCK LLM mode, skip real Gemini call entirely
         if self.use_mock_llm:
             return self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
 
-        # Build quiz type instructions
-        quiz_type_instructions = self._get_quiz_type_instructions(quiz_type)
-        difficulty_instructions = self._get_difficulty_instructions(difficulty)
+        cache_key = self._cache_key(quiz_type, num_questions, difficulty, topic)
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-        prompt = f"""Sen bir eğitim uzmanı ve sınav hazırlayıcısısın.
-Görevin, verilen ders notu BAĞLAMINA göre quiz soruları üretmek.
+        parts = self._split_quiz(quiz_type, num_questions)
+        prompts = [
+            self._build_prompt(context, part_type, count, difficulty, topic)
+            for part_type, count in parts
+        ]
 
-BAĞLAM (ders notlarından alınmış parçalar):
-{context}
-
-QUIZ PARAMETRELERİ:
-- Quiz türü: {quiz_type}
-- Soru sayısı: {num_questions}
-- Zorluk seviyesi: {difficulty}
-- Özel konu odağı: {topic or "belirtilmedi (tüm içerikten sor)"}
+        def generate(prompt: str) -> str:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config,
+            )
+            return response.text
 
-{quiz_type_instructions}
+        try:
+            if len(prompts) == 1:
+                raw_texts = [generate(prompts[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+                    raw_texts = list(executor.map(generate, prompts))
+        except Exception as exc:
+            return self._llm_error_quiz(exc, quiz_type, num_questions, difficulty, topic)
+
+        data = self._assemble_quiz(raw_texts, parts, quiz_type, num_questions, difficulty, topic)
+        # Mock fallbacks always carry a note; only real quizzes are cached
+        if "note" not in data:
+            self.llm_cache.put(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
+        return data
 
-{difficulty_instructions}
+    async def generate_quiz_async(
+        self,
+        quiz_type: QuizType = "multiple_choice",
+        num_questions: int = 5,
+        difficulty: DifficultyLevel = "medium",
+        topic: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_quiz, for the API's event loop.
 
-TALİMATLAR:
-1. Sadece verilen bağlamdaki bilgilere göre soru sor
-2. Her sorunun açık ve anlaşılır olmasını sağla
-3. Doğru cevabı ve kısa bir açıklama ekle
-4. Kaynak sayfa numarasını belirt (context'ten)
-5. Türkçe olarak yaz
+        Retrieval runs in a worker thread and the LLM calls are awaited
+        with generate_content_async; the sub-prompts of a mixed quiz are
+        sent concurrently with asyncio.gather.
 
-SADECE AŞAĞIDAKİ JSON ŞEMASINA UYAN GEÇERLİ BİR JSON DÖNDÜR.
-Açıklama veya markdown yazma, sadece JSON.
+        Args:
+            quiz_type: Type of quiz - multiple_choice, true_false, open_ended, or mixed
+            num_questions: Number of questions to generate (1-20)
+            difficulty: Difficulty level - easy, medium, or hard
+            topic: Optional specific topic to focus on
 
-JSON ŞEMASI:
-{{
-  "quiz_type": "{quiz_type}",
-  "difficulty": "{difficulty}",
-  "num_questions": {num_questions},
-  "topic": str veya null,
-  "questions": [
-    {{
-      "id": int,                    // 1, 2, 3...
-      "type": str,                  // "multiple_choice", "true_false", "open_ended"
-      "question": str,              // Soru metni
-      "choices": [str, ...] | null, // Şıklar (açık uçlu için null)
-      "correct_answer": str,        // Doğru cevap
-      "explanation": str,           // Kısa açıklama
-      "source_page": int            // Kaynak sayfa numarası
-    }}
-  ],
-  "answer_key": {{                  // Cevap anahtarı
-    "1": str,
-    "2": str,
-    ...
-  }}
-}}
-"""
+        Returns:
+            Dict containing quiz questions and answer key
+        """
+        context = await asyncio.to_thread(self._retrieve_context, topic)
 
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config,
-            )
-            raw_text = response.text
-        except google_exceptions.GoogleAPIError as exc:
-            print(
-                f"⚠️ QuizGenerator Gemini error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK quiz."
-            )
-            return self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
-        except Exception as exc:  # pragma: no cover - defensive
-            print(
-                f"⚠️ Unexpected QuizGenerator error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK quiz."
-            )
+        # If we are in MOCK LLM mode, skip real Gemini call entirely
+        if self.use_mock_llm:
             return self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
 
-        # Parse JSON response
-        try:
-            # Clean up potential markdown formatting
-            clean_text = raw_text.strip()
-            if clean_text.startswith("```json"):
-                clean_text = clean_text[7:]
-            if clean_text.startswith("```"):
-                clean_text = clean_text[3:]
-            if clean_text.endswith("```"):
-                clean_text = clean_text[:-3]
-            
-            data = json.loads(clean_text.strip())
-        except json.JSONDecodeError:
-            # Fallback: return mock quiz with error note
-            mock_data = self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
-            mock_data["note"] = f"Model geçerli JSON döndüremedi. Raw response: {raw_text[:500]}"
-            return mock_data
+        cache_key = self._cache_key(quiz_type, num_questions, difficulty, topic)
+        cached = await self.llm_cache.aget(cache_key)
+        if cached is not None:
+            return cached
 
-        # Ensure required fields exist
-        data.setdefault("quiz_type", quiz_type)
-        data.setdefault("difficulty", difficulty)
-        data.setdefault("num_questions", num_questions)
-        
-        # Build answer key if not provided
-        if "answer_key" not in data and "questions" in data:
-            data["answer_key"] = {
-                str(q["id"]): q.get("correct_answer", "")
-                for q in data["questions"]
-            }
+        parts = self._split_quiz(quiz_type, num_questions)
+        prompts = [
+            self._build_prompt(context, part_type, count, difficulty, topic)
+            for part_type, count in parts
+        ]
 
+        try:
+            responses = await asyncio.gather(*(
+                self.model.generate_content_async(
+                    prompt,
+                    generation_config=self.generation_config,
+                )
+                for prompt in prompts
+            ))
+            raw_texts = [response.text for response in responses]
+        except Exception as exc:
+            return self._llm_error_quiz(exc, quiz_type, num_questions, difficulty, topic)
+
+        data = self._assemble_quiz(raw_texts, parts, quiz_type, num_questions, difficulty, topic)
+        # Mock fallbacks always carry a note; only real quizzes are cached
+        if "note" not in data:
+            await self.llm_cache.aput(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
         return data
 
-    def _get_quiz_type_instructions(self, quiz_type: QuizType) -> str:
-        """Get specific instructions for each quiz type."""
-        instructions = {
-            "multiple_choice": """
-ÇOKTAN SEÇMELİ SORULAR İÇİN:
-- Her soru için 4 şık oluştur (A, B, C, D)
-- Sadece bir doğru cevap olsun
-- Yanlış şıklar mantıklı ama yanlış olsun (çeldirici)
-- choices: ["A) ...", "B) ...", "C) ...", "D) ..."]
-- correct_answer: sadece harf (örn: "A")
-""",
-            "true_false": """
-DOĞRU-YANLIŞ SORULARI İÇİN:
-- Açık ve net ifadeler yaz
-- Belirsiz ifadelerden kaçın
-- choices: ["Doğru", "Yanlış"]
-- correct_answer: "Doğru" veya "Yanlış"
-""",
-            "open_ended": """
-AÇIK UÇLU SORULAR İÇİN:
-- Düşünmeye ve açıklamaya teşvik eden sorular sor
-- choices: null (şık yok)
-- correct_answer: beklenen cevabın özeti
-""",
-            "mixed": """
-KARMA QUIZ İÇİN:
-- Farklı türlerde sorular karıştır
-- Çoktan seçmeli, doğru-yanlış ve açık uçlu sorular ekle
-- Her sorunun type alanını doğru belirt
-"""
-        }
-        return instructions.get(quiz_type, instructions["multiple_choice"])
+    async def generate_quiz_stream(
+        self,
+        quiz_type: QuizType = "multiple_choice",
+        num_questions: int = 5,
+        difficulty: DifficultyLevel = "medium",
+        topic: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a quiz, yielding each question as soon as the model has
+        finished writing it.
 
-    def _get_difficulty_instructions(self, difficulty: DifficultyLevel) -> str:
-        """Get specific instructions for each difficulty level."""
-        instructions = {
-            "easy": """
-KOLAY SEVİYE:
-- Temel kavram ve tanım soruları
-- Doğrudan metinde geçen bilgiler
-- Karmaşık hesaplama veya analiz gerektirmeyen sorular
-""",
-            "medium": """
-ORTA SEVİYE:
-- Kavramları anlama ve uygulama soruları
-- Birden fazla bilgiyi birleştirmeyi gerektiren sorular
-- Temel düzeyde analiz gerektiren sorular
-""",
-            "hard": """
-ZOR SEVİYE:
-- Analiz ve sentez gerektiren sorular
-- Kavramlar arası ilişkileri sorgulayan sorular
-- Eleştirel düşünme gerektiren sorular
-- Verilen bilgiyi farklı bağlamlara uygulamayı gerektiren sorular
-"""
-        }
-        return instructions.get(difficulty, instructions["medium"])
+        Every sub-quiz prompt is streamed concurrently and its reply fed to
+        a JSONArrayItemStream, so questions surface long before the whole
+        reply has arrived. The streamed questions are previews; once every
+        reply is complete it is parsed and validated like in
+        generate_quiz_async, and the result (or the mock fallback) is the
+        last event.
+
+        Args:
+            quiz_type: Type of quiz - multiple_choice, true_false, open_ended, or mixed
+            num_questions: Number of questions to generate (1-20)
+            difficulty: Difficulty level - easy, medium, or hard
+            topic: Optional specific topic to focus on
+
+        Yields:
+            {"type": "question", "question": ...} events, then one
+            {"type": "quiz", "quiz": ...} event with the complete quiz
+        """
+        context = await asyncio.to_thread(self._retrieve_context, topic)
+
+        cache_key = self._cache_key(quiz_type, num_questions, difficulty, topic)
+        if self.use_mock_llm:
+            data = self._build_mock_quiz(quiz_type, num_questions, difficulty, topic)
+        else:
+            data = await self.llm_cache.aget(cache_key)
+        if data is not None:
+            for question in data.get("questions", []):
+                yield {"type": "question", "question": question}
+            yield {"type": "quiz", "quiz": data}
+            return
+
+        parts = self._split_quiz(quiz_type, num_questions)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def stream_part(part_type: QuizType, count: int) -> str:
+            prompt = self._build_prompt(context, part_type, count, difficulty, topic)
+            questions = JSONArrayItemStream("questions")
+            pieces = []
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self.generation_config,
+                stream=True,
+            )
+            async for chunk in response:
+                pieces.append(chunk.text)
+                for question in questions.feed(chunk.text):
+                    if len(parts) > 1:
+                        question["type"] = part_type
+                    await queue.put(question)
+            return "".join(pieces)
+
+        tasks = [asyncio.ensure_future(stream_part(*part)) for part in parts]
+        gathered = asyncio.gather(*tasks)
+        # Wake the loop below when the last reply is complete
+        gathered.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (question := await queue.get()) is not None:
+                yield {"type": "question", "question": question}
+            raw_texts = gathered.result()
+        except Exception as exc:
+            yield {"type": "quiz", "quiz": self._llm_error_quiz(
+                exc, quiz_type, num_questions, difficulty, topic
+            )}
+            return
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        data = self._assemble_quiz(raw_texts, parts, quiz_type, num_questions, difficulty, topic)
+        # Mock fallbacks always carry a note; only real quizzes are cached
+        if "note" not in data:
+            await self.llm_cache.aput(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
+        yield {"type": "quiz", "quiz": data}
 
 
 # Singleton instance
 _quiz_generator: Optional[QuizGenerator] = None
+_quiz_generator_lock = threading.Lock()
 
 
 def get_quiz_generator() -> QuizGenerator:
@@ -328,5 +734,7 @@ def get_quiz_generator() -> QuizGenerator:
     """
     global _quiz_generator
     if _quiz_generator is None:
-        _quiz_generator = QuizGenerator()
+        with _quiz_generator_lock:
+            if _quiz_generator is None:
+                _quiz_generator = QuizGenerator()
     return _quiz_generator
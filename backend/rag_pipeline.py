@@ -2,33 +2,88 @@
 RAG Pipeline for StudyRAG
 Handles PDF loading, chunking, and vector store creation
 """
+import asyncio
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
+import faiss
+import numpy as np
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
-from backend.config import CHUNK_SIZE, CHUNK_OVERLAP, VECTORSTORE_DIR
+from backend.config import (
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBED_CONCURRENCY,
+    VECTORSTORE_DIR,
+    VECTORSTORE_CACHE_DIR,
+    FAISS_INDEX_TYPE,
+)
 from backend.embedding_service import get_embedding_service
 
+try:
+    from semantic_text_splitter import TextSplitter as _NativeTextSplitter
+except ImportError:  # pragma: no cover - optional accelerator
+    _NativeTextSplitter = None
+
+
+# Read size when hashing uploaded PDFs
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+# Chunks handed from the PDF reader to the embedder at a time in aprocess_pdf
+_PIPELINE_BATCH = 64
+
+# Scalar quantizer per FAISS_INDEX_TYPE; "flat" keeps LangChain's IndexFlatL2
+_SQ_TYPES = {
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+}
+
+# sq8 learns per-dimension value ranges from the vectors the index is
+# created with; each range is widened by this fraction on both sides for
+# vectors added later
+_SQ_RANGE_MARGIN = 0.2
+
+# Chunks aprocess_pdf embeds before creating an sq8 index, so its ranges
+# are trained on (up to) this many vectors rather than the first batch
+_SQ_TRAIN_SAMPLE = 4096
+
 
 class GeminiEmbeddings(Embeddings):
     """
     Wrapper class to make Google Gemini embeddings compatible with LangChain
+    
+    Vectors are float32 NumPy arrays rather than lists of floats; the
+    FAISS vectorstore accepts both and converts to float32 anyway.
     """
     
     def __init__(self):
         self.embedding_service = get_embedding_service()
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
         """Embed search documents"""
         return self.embedding_service.embed_documents(texts)
     
-    def embed_query(self, text: str) -> List[float]:
+    def embed_query(self, text: str) -> np.ndarray:
         """Embed query text"""
         return self.embedding_service.embed_query(text)
 
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embed several query texts with batched API calls"""
+        return self.embedding_service.embed_queries(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> np.ndarray:
+        """Embed search documents with concurrent batches"""
+        return await self.embedding_service.aembed_documents(texts)
+
 
 class RAGPipeline:
     """
@@ -44,8 +99,18 @@ class RAGPipeline:
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
+        # Same character budget, split by the Rust semantic-text-splitter when installed
+        self.native_splitter = (
+            _NativeTextSplitter(CHUNK_SIZE, overlap=CHUNK_OVERLAP)
+            if _NativeTextSplitter is not None else None
+        )
+        self.splitter_name = "semantic-text-splitter" if self.native_splitter is not None else "recursive"
         self.vectorstore: Optional[FAISS] = None
-        print(f"✓ RAG Pipeline initialized (chunk_size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP})")
+        self.vectorstore_name: Optional[str] = None
+        print(
+            f"✓ RAG Pipeline initialized (chunk_size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP}, "
+            f"splitter={self.splitter_name})"
+        )
     
     def load_pdf(self, pdf_path: str) -> List:
         """
@@ -77,10 +142,26 @@ class RAGPipeline:
             List of chunked Document objects
         """
         print(f"✂️  Splitting documents into chunks...")
-        chunks = self.text_splitter.split_documents(documents)
+        chunks = self.split_pages(documents)
         print(f"✓ Created {len(chunks)} chunks")
         return chunks
     
+    def split_pages(self, pages: List) -> List:
+        """
+        Split pages into chunks that keep their page's metadata
+        
+        Uses semantic-text-splitter (Rust, same CHUNK_SIZE characters and
+        overlap) when installed, LangChain's RecursiveCharacterTextSplitter
+        otherwise. Both split each page on its own.
+        """
+        if self.native_splitter is None:
+            return self.text_splitter.split_documents(pages)
+        return [
+            Document(page_content=text, metadata=dict(page.metadata))
+            for page in pages
+            for text in self.native_splitter.chunks(page.page_content)
+        ]
+    
     def create_vectorstore(self, chunks: List, vectorstore_name: str = "default") -> FAISS:
         """
         Create FAISS vector store from document chunks
@@ -95,19 +176,213 @@ class RAGPipeline:
         print(f"🔢 Creating embeddings and vector store...")
         
         # Create vector store
-        vectorstore = FAISS.from_documents(
-            documents=chunks,
-            embedding=self.embeddings
+        texts = [c.page_content for c in chunks]
+        vectorstore = self._add_embeddings(
+            None, texts, self.embeddings.embed_documents(texts), [c.metadata for c in chunks]
         )
         
         # Save to disk
-        vectorstore_path = Path(VECTORSTORE_DIR) / vectorstore_name
-        vectorstore.save_local(str(vectorstore_path))
-        print(f"✓ Vector store saved to: {vectorstore_path}")
+        self._save_vectorstore(vectorstore, vectorstore_name)
+        
+        self.vectorstore = vectorstore
+        self.vectorstore_name = vectorstore_name
+        return vectorstore
+    
+    async def acreate_vectorstore(self, chunks: List, vectorstore_name: str = "default") -> FAISS:
+        """
+        Async variant of create_vectorstore
+        
+        Embedding batches are submitted concurrently and the vectorstore
+        is written to disk in a worker thread.
+        
+        Args:
+            chunks: List of document chunks
+            vectorstore_name: Name for saving the vectorstore
+            
+        Returns:
+            FAISS vectorstore instance
+        """
+        print(f"🔢 Creating embeddings and vector store...")
+        
+        texts = [c.page_content for c in chunks]
+        vectorstore = self._add_embeddings(
+            None, texts, await self.embeddings.aembed_documents(texts), [c.metadata for c in chunks]
+        )
+        
+        await asyncio.to_thread(self._save_vectorstore, vectorstore, vectorstore_name)
+        
+        self.vectorstore = vectorstore
+        self.vectorstore_name = vectorstore_name
+        return vectorstore
+    
+    def _read_chunks(self, pdf_path: str, emit: Callable[[Optional[List]], None]) -> None:
+        """
+        Read a PDF page by page and emit its chunks in batches of _PIPELINE_BATCH
+        
+        Blocking; run it in a worker thread. Pages are split as they are
+        parsed, which gives the same chunks as split_pages over the whole
+        PDF (it splits each page on its own). None is emitted last,
+        also on failure, after which the exception propagates.
+        """
+        try:
+            if not os.path.exists(pdf_path):
+                raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+            
+            print(f"📄 Loading PDF: {pdf_path}")
+            batch: List = []
+            for page in PyPDFLoader(pdf_path).lazy_load():
+                batch.extend(self.split_pages([page]))
+                if len(batch) >= _PIPELINE_BATCH:
+                    emit(batch)
+                    batch = []
+            if batch:
+                emit(batch)
+        finally:
+            emit(None)
+    
+    async def _apipeline_vectorstore(self, pdf_path: str, vectorstore_name: str) -> FAISS:
+        """
+        Build a vectorstore while the PDF is still being read
+        
+        A worker thread parses pages and hands over chunk batches; each
+        batch is embedded as soon as it arrives (up to EMBED_CONCURRENCY
+        batches in flight) and added to the FAISS index in document order
+        as its vectors come back. Total time is then close to the slower
+        of PDF parsing and embedding instead of their sum.
+        """
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue()
+        reader = loop.run_in_executor(
+            None,
+            self._read_chunks,
+            pdf_path,
+            lambda batch: loop.call_soon_threadsafe(batches.put_nowait, batch),
+        )
+        semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+        
+        async def embed(batch: List) -> np.ndarray:
+            async with semaphore:
+                return await self.embeddings.aembed_documents([c.page_content for c in batch])
+        
+        # Embedded batches in document order, consumed by index() as they finish
+        embedded: asyncio.Queue = asyncio.Queue()
+        
+        async def index() -> Tuple[Optional[FAISS], int]:
+            vectorstore = None
+            num_chunks = 0
+            # sq8 is trained when the index is created: hold back batches
+            # until there is a representative sample (or the PDF ends)
+            held_chunks: List = []
+            held_vectors: List[np.ndarray] = []
+            while (item := await embedded.get()) is not None:
+                batch, task = item
+                held_chunks.extend(batch)
+                held_vectors.append(await task)
+                num_chunks += len(batch)
+                if vectorstore is None and FAISS_INDEX_TYPE == "sq8" and num_chunks < _SQ_TRAIN_SAMPLE:
+                    continue
+                vectorstore = self._add_embeddings(
+                    vectorstore,
+                    [c.page_content for c in held_chunks],
+                    np.concatenate(held_vectors),
+                    [c.metadata for c in held_chunks],
+                )
+                held_chunks, held_vectors = [], []
+            if held_chunks:
+                vectorstore = self._add_embeddings(
+                    vectorstore,
+                    [c.page_content for c in held_chunks],
+                    np.concatenate(held_vectors),
+                    [c.metadata for c in held_chunks],
+                )
+            return vectorstore, num_chunks
+        
+        print(f"🔢 Creating embeddings and vector store...")
+        indexer = asyncio.ensure_future(index())
+        pending = []
+        try:
+            while (batch := await batches.get()) is not None:
+                task = asyncio.ensure_future(embed(batch))
+                pending.append(task)
+                embedded.put_nowait((batch, task))
+            embedded.put_nowait(None)
+            await reader
+            vectorstore, num_chunks = await indexer
+        finally:
+            indexer.cancel()
+            for task in pending:
+                task.cancel()
+        
+        if vectorstore is None:
+            raise ValueError(f"No text could be extracted from PDF: {pdf_path}")
+        print(f"✓ Created {num_chunks} chunks")
+        
+        await asyncio.to_thread(self._save_vectorstore, vectorstore, vectorstore_name)
         
         self.vectorstore = vectorstore
+        self.vectorstore_name = vectorstore_name
+        return vectorstore
+    
+    def _add_embeddings(
+        self,
+        vectorstore: Optional[FAISS],
+        texts: List[str],
+        vectors: np.ndarray,
+        metadatas: List[dict],
+    ) -> FAISS:
+        """
+        Add embedded chunks to a vectorstore, creating it on the first call
+        
+        With FAISS_INDEX_TYPE sq8 or fp16 the vectors are L2-normalized and
+        kept in an IndexScalarQuantizer searched by inner product (cosine
+        similarity): 1 or 2 bytes per dimension instead of 4, with nearly
+        the same ranking. sq8 is trained on the vectors of the first call.
+        fp16 needs no training.
+        """
+        sq_type = _SQ_TYPES.get(FAISS_INDEX_TYPE)
+        if sq_type is None:
+            if vectorstore is None:
+                return FAISS.from_embeddings(zip(texts, vectors), self.embeddings, metadatas=metadatas)
+            vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas)
+            return vectorstore
+        
+        vectors = np.array(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        if vectorstore is None:
+            index = faiss.IndexScalarQuantizer(vectors.shape[1], sq_type, faiss.METRIC_INNER_PRODUCT)
+            index.sq.rangestat_arg = _SQ_RANGE_MARGIN
+            index.train(vectors)
+            vectorstore = FAISS(
+                self.embeddings,
+                index,
+                InMemoryDocstore(),
+                {},
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+        vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas)
         return vectorstore
     
+    @staticmethod
+    def _install_files(source_dir: Path, vectorstore_path: Path) -> None:
+        """
+        Move the files of source_dir into vectorstore_path, each with an atomic rename
+        
+        Overwriting index.faiss in place would truncate the file under a
+        process that is still reading it; a rename leaves that process on
+        the old inode.
+        """
+        vectorstore_path.mkdir(parents=True, exist_ok=True)
+        for file in source_dir.iterdir():
+            os.replace(file, vectorstore_path / file.name)
+    
+    def _save_vectorstore(self, vectorstore: FAISS, vectorstore_name: str) -> None:
+        """Save a vectorstore under VECTORSTORE_DIR"""
+        vectorstore_path = Path(VECTORSTORE_DIR) / vectorstore_name
+        with tempfile.TemporaryDirectory(dir=VECTORSTORE_DIR) as staging:
+            vectorstore.save_local(staging)
+            self._install_files(Path(staging), vectorstore_path)
+        print(f"✓ Vector store saved to: {vectorstore_path}")
+    
     def load_vectorstore(self, vectorstore_name: str = "default") -> FAISS:
         """
         Load existing vector store from disk
@@ -129,15 +404,68 @@ class RAGPipeline:
             self.embeddings,
             allow_dangerous_deserialization=True
         )
+        # Quantized indexes are searched by cosine similarity (see _add_embeddings)
+        if vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            vectorstore.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
         
         self.vectorstore = vectorstore
+        self.vectorstore_name = vectorstore_name
         print(f"✓ Vector store loaded successfully")
         return vectorstore
     
+    def content_digest(self, pdf_path: str) -> str:
+        """
+        Hash a PDF together with the settings that shape its vectorstore
+        
+        Identical files processed with the same embedding model, splitter,
+        index type and chunking parameters share a digest, and therefore a
+        vectorstore.
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            Hex SHA-256 digest
+        """
+        settings = f"{self.embeddings.embedding_service.model_name}\0{CHUNK_SIZE}\0{CHUNK_OVERLAP}\0"
+        # Digests from before the splitter and index type were configurable stay valid
+        if self.native_splitter is not None:
+            settings += f"{self.splitter_name}\0"
+        if FAISS_INDEX_TYPE in _SQ_TYPES:
+            settings += f"{FAISS_INDEX_TYPE}\0"
+        digest = hashlib.sha256(settings.encode("utf-8"))
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _load_by_digest(self, digest: str, vectorstore_name: str) -> Optional[FAISS]:
+        """Copy a content-addressed vectorstore to vectorstore_name and load it, if cached"""
+        cached_path = Path(VECTORSTORE_CACHE_DIR) / digest
+        if not cached_path.exists():
+            return None
+        
+        print(f"♻️  Identical PDF already processed, reusing vector store {digest[:12]}")
+        with tempfile.TemporaryDirectory(dir=VECTORSTORE_DIR) as staging:
+            shutil.copytree(cached_path, staging, dirs_exist_ok=True)
+            self._install_files(Path(staging), Path(VECTORSTORE_DIR) / vectorstore_name)
+        return self.load_vectorstore(vectorstore_name)
+    
+    def _store_by_digest(self, digest: str, vectorstore_name: str) -> None:
+        """Keep a content-addressed copy of a freshly saved vectorstore"""
+        shutil.copytree(
+            Path(VECTORSTORE_DIR) / vectorstore_name,
+            Path(VECTORSTORE_CACHE_DIR) / digest,
+            dirs_exist_ok=True
+        )
+    
     def process_pdf(self, pdf_path: str, vectorstore_name: str = "default") -> FAISS:
         """
         Complete pipeline: Load PDF -> Chunk -> Create Vector Store
         
+        A PDF whose content (and pipeline settings) were processed before
+        reuses that vectorstore instead of being embedded again.
+        
         Args:
             pdf_path: Path to PDF file
             vectorstore_name: Name for the vectorstore
@@ -149,6 +477,12 @@ class RAGPipeline:
         print(f"🚀 Starting RAG Pipeline for: {Path(pdf_path).name}")
         print(f"{'='*60}\n")
         
+        # Identical content: reuse the earlier vectorstore
+        digest = self.content_digest(pdf_path)
+        vectorstore = self._load_by_digest(digest, vectorstore_name)
+        if vectorstore is not None:
+            return vectorstore
+        
         # Step 1: Load PDF
         documents = self.load_pdf(pdf_path)
         
@@ -157,6 +491,42 @@ class RAGPipeline:
         
         # Step 3: Create vector store
         vectorstore = self.create_vectorstore(chunks, vectorstore_name)
+        self._store_by_digest(digest, vectorstore_name)
+        
+        print(f"\n{'='*60}")
+        print(f"✅ RAG Pipeline completed successfully!")
+        print(f"{'='*60}\n")
+        
+        return vectorstore
+    
+    async def aprocess_pdf(self, pdf_path: str, vectorstore_name: str = "default") -> FAISS:
+        """
+        Async variant of process_pdf
+        
+        PDF loading and chunking run in a worker thread so the event loop
+        stays free, overlapped with embedding: batches of chunks are
+        embedded while later pages are still being parsed.
+        
+        Args:
+            pdf_path: Path to PDF file
+            vectorstore_name: Name for the vectorstore
+            
+        Returns:
+            FAISS vectorstore instance
+        """
+        print(f"\n{'='*60}")
+        print(f"🚀 Starting RAG Pipeline for: {Path(pdf_path).name}")
+        print(f"{'='*60}\n")
+        
+        # Identical content: reuse the earlier vectorstore
+        digest = await asyncio.to_thread(self.content_digest, pdf_path)
+        vectorstore = await asyncio.to_thread(self._load_by_digest, digest, vectorstore_name)
+        if vectorstore is not None:
+            return vectorstore
+        
+        # Load, chunk and embed as one pipeline
+        vectorstore = await self._apipeline_vectorstore(pdf_path, vectorstore_name)
+        await asyncio.to_thread(self._store_by_digest, digest, vectorstore_name)
         
         print(f"\n{'='*60}")
         print(f"✅ RAG Pipeline completed successfully!")
@@ -167,6 +537,7 @@ class RAGPipeline:
 
 # Singleton instance
 _rag_pipeline = None
+_rag_pipeline_lock = threading.Lock()
 
 
 def get_rag_pipeline() -> RAGPipeline:
@@ -178,5 +549,7 @@ def get_rag_pipeline() -> RAGPipeline:
     """
     global _rag_pipeline
     if _rag_pipeline is None:
-        _rag_pipeline = RAGPipeline()
+        with _rag_pipeline_lock:
+            if _rag_pipeline is None:
+                _rag_pipeline = RAGPipeline()
     return _rag_pipeline
@@ -2,30 +2,119 @@
 Retrieval Service for StudyRAG
 Handles similarity search and question answering using Google Gemini
 """
-import google.generativeai as genai
-from typing import List, Dict, Any, Optional
-from langchain_community.vectorstores import FAISS
-from backend.config import GOOGLE_API_KEY, LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from itertools import zip_longest
+import faiss
+import numpy as np
+from typing import Callable, FrozenSet, List, Dict, Any, Iterator, Optional
+from backend.config import LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS
+from backend.llm_cache import get_llm_cache
+from backend.llm_client import get_llm_model
 from backend.rag_pipeline import get_rag_pipeline
 
 
+# Near-duplicate detection in build_context_from_docs: chunks are compared
+# as sets of word 5-grams, and one whose Jaccard similarity with an
+# already kept chunk exceeds the threshold is left out of the prompt
+_SHINGLE_SIZE = 5
+_NEAR_DUPLICATE_JACCARD = 0.8
+
+
+def _shingles(text: str) -> FrozenSet[int]:
+    """Hashed word n-grams of a text (the whole text if it is shorter)"""
+    words = text.split()
+    if len(words) <= _SHINGLE_SIZE:
+        return frozenset((hash(tuple(words)),))
+    return frozenset(
+        hash(tuple(words[i:i + _SHINGLE_SIZE]))
+        for i in range(len(words) - _SHINGLE_SIZE + 1)
+    )
+
+
+@dataclass
+class RetrievedBatch:
+    """
+    Retrieved documents in rank order, stored as one list per field
+    
+    Building the prompt context only walks the contents and pages
+    columns, so no per-document dict is created unless the documents are
+    returned to an API client (to_list_of_dicts).
+    """
+    contents: List[str] = field(default_factory=list)
+    sources: List[Any] = field(default_factory=list)
+    pages: List[Any] = field(default_factory=list)
+    ranks: List[int] = field(default_factory=list)
+    
+    @classmethod
+    def from_documents(cls, docs: List[Any]) -> "RetrievedBatch":
+        """Columns of ranked LangChain Documents"""
+        return cls(
+            contents=[doc.page_content for doc in docs],
+            sources=[doc.metadata.get("source", "unknown") for doc in docs],
+            pages=[doc.metadata.get("page", "unknown") for doc in docs],
+            ranks=list(range(1, len(docs) + 1)),
+        )
+    
+    @classmethod
+    def interleave(cls, batches: List["RetrievedBatch"], limit: int) -> "RetrievedBatch":
+        """
+        Merge the results of several queries round-robin by rank
+        
+        Each distinct content is kept once, at its best position, and at
+        most `limit` documents are kept; ranks are renumbered.
+        """
+        merged = cls()
+        seen = set()
+        columns = [zip(batch.contents, batch.sources, batch.pages) for batch in batches]
+        for rank_docs in zip_longest(*columns):
+            for doc in rank_docs:
+                if doc is not None and doc[0] not in seen and len(merged) < limit:
+                    seen.add(doc[0])
+                    merged.append(*doc)
+        return merged
+    
+    def __len__(self) -> int:
+        return len(self.contents)
+    
+    def append(self, content: str, source: Any, page: Any) -> None:
+        """Add a document ranked after the current ones"""
+        self.contents.append(content)
+        self.sources.append(source)
+        self.pages.append(page)
+        self.ranks.append(len(self.ranks) + 1)
+    
+    def to_list_of_dicts(self) -> List[Dict[str, Any]]:
+        """Documents as the API's "sources" dictionaries"""
+        return [
+            {"content": content, "source": source, "page": page, "rank": rank}
+            for content, source, page, rank in zip(self.contents, self.sources, self.pages, self.ranks)
+        ]
+
+
 class RetrievalService:
     """
     Service for retrieving relevant documents and generating answers
     """
     
     def __init__(self):
-        """Initialize the retrieval service with Google Gemini"""
-        genai.configure(api_key=GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(LLM_MODEL)
+        """Initialize the retrieval service with the shared Gemini model"""
         self.rag_pipeline = get_rag_pipeline()
+        self.llm_cache = get_llm_cache()
         self.generation_config = {
             "temperature": TEMPERATURE,
             "max_output_tokens": MAX_TOKENS,
         }
         print(f"✓ Retrieval Service initialized with model: {LLM_MODEL}")
     
-    def retrieve_documents(self, query: str, k: int = TOP_K_RESULTS) -> List[Dict[str, Any]]:
+    @property
+    def model(self):
+        """Shared Gemini model, created on the first question (never in mock runs)"""
+        return get_llm_model()
+    
+    def retrieve_documents(self, query: str, k: int = TOP_K_RESULTS) -> RetrievedBatch:
         """
         Retrieve most relevant documents for a query
         
@@ -34,7 +123,7 @@ class RetrievalService:
             k: Number of documents to retrieve
             
         Returns:
-            List of dictionaries containing document content and metadata
+            RetrievedBatch with document contents and metadata
         """
         if self.rag_pipeline.vectorstore is None:
             raise ValueError("No vector store loaded. Please process a PDF first.")
@@ -42,33 +131,156 @@ class RetrievalService:
         # Similarity search
         docs = self.rag_pipeline.vectorstore.similarity_search(query, k=k)
         
-        # Format results
-        results = []
-        for i, doc in enumerate(docs):
-            results.append({
-                "content": doc.page_content,
-                "source": doc.metadata.get("source", "unknown"),
-                "page": doc.metadata.get("page", "unknown"),
-                "rank": i + 1
-            })
+        return RetrievedBatch.from_documents(docs)
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed a search query for retrieve_by_vector
+        
+        Args:
+            query: Search query
+        
+        Returns:
+            Query embedding (served from the embedding service's LRU cache
+            when the query was seen before)
+        """
+        return self.rag_pipeline.embeddings.embed_query(query)
+    
+    def retrieve_by_vector(
+        self,
+        vector: np.ndarray,
+        k: int = TOP_K_RESULTS,
+        fetch_k: Optional[int] = None,
+        lambda_mult: float = 0.5
+    ) -> RetrievedBatch:
+        """
+        Retrieve most relevant documents for an already embedded query
+        
+        With fetch_k, the k documents are picked from the fetch_k nearest
+        by maximal marginal relevance, using the vectors stored in the
+        index: a chunk much like one already picked (a repeated header,
+        an overlapping split) loses to a less similar one.
+        
+        Args:
+            vector: Query embedding, e.g. from embed_query
+            k: Number of documents to retrieve
+            fetch_k: Number of nearest documents to pick from (None: no MMR)
+            lambda_mult: MMR trade-off, 1 for relevance only, 0 for diversity only
+        
+        Returns:
+            RetrievedBatch with document contents and metadata
+        """
+        if self.rag_pipeline.vectorstore is None:
+            raise ValueError("No vector store loaded. Please process a PDF first.")
+        
+        # The vectorstore normalizes a copy for inner-product indexes
+        embedding = np.asarray(vector, dtype=np.float32).tolist()
+        if fetch_k is None:
+            docs = self.rag_pipeline.vectorstore.similarity_search_by_vector(embedding, k=k)
+        else:
+            docs = self.rag_pipeline.vectorstore.max_marginal_relevance_search_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+            )
         
-        return results
+        return RetrievedBatch.from_documents(docs)
     
-    def build_context_from_docs(self, documents: List[Dict[str, Any]]) -> str:
+    def retrieve_documents_batch(
+        self,
+        queries: List[str],
+        k: int = TOP_K_RESULTS
+    ) -> List[RetrievedBatch]:
+        """
+        Retrieve the most relevant documents for several queries at once
+        
+        All queries are embedded in one batched API call and searched with
+        a single FAISS index.search over the stacked query matrix, instead
+        of one embedding round-trip and one search per query.
+        
+        Args:
+            queries: Search queries
+            k: Number of documents to retrieve per query
+            
+        Returns:
+            One RetrievedBatch (as retrieve_documents returns) per query,
+            in query order
+        """
+        vectorstore = self.rag_pipeline.vectorstore
+        if vectorstore is None:
+            raise ValueError("No vector store loaded. Please process a PDF first.")
+        if not queries:
+            return []
+        
+        vectors = np.ascontiguousarray(
+            self.rag_pipeline.embeddings.embed_queries(queries), dtype=np.float32
+        )
+        if vectorstore._normalize_L2:
+            faiss.normalize_L2(vectors)
+        _, ids = vectorstore.index.search(vectors, k)
+        
+        search = vectorstore.docstore.search
+        docstore_ids = vectorstore.index_to_docstore_id
+        # FAISS pads rows with -1 when the index holds fewer than k vectors
+        return [
+            RetrievedBatch.from_documents([search(docstore_ids[i]) for i in row.tolist() if i != -1])
+            for row in ids
+        ]
+    
+    def build_context_from_docs(
+        self,
+        documents: RetrievedBatch,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        count_tokens: Optional[Callable[[str], int]] = None
+    ) -> str:
         """
         Build context string from retrieved documents
         
+        Exact duplicates (by content digest) and near-duplicates (by
+        shingle Jaccard similarity) of a higher-ranked document are
+        dropped, so repeated text doesn't cost prompt tokens twice.
+        Kept documents keep their rank in the "Kaynak" label.
+        
         Args:
-            documents: List of document dictionaries
+            documents: Retrieved documents
+            max_chars: Optional length limit; documents that would not fit
+                whole are left out (only a lone first one is cut)
+            max_tokens: Optional token budget, measured per document with
+                count_tokens; documents past it are left out the same way
+                (a lone first one is kept)
+            count_tokens: Token count of a context part, for max_tokens
             
         Returns:
             Formatted context string
         """
         context_parts = []
-        for doc in documents:
-            context_parts.append(
-                f"[Kaynak {doc['rank']} - Sayfa {doc['page']}]\n{doc['content']}\n"
-            )
+        length = 0
+        tokens = 0
+        digests = set()
+        kept_shingles: List[FrozenSet[int]] = []
+        for content, page, rank in zip(documents.contents, documents.pages, documents.ranks):
+            digest = hashlib.blake2b(content.encode("utf-8"), digest_size=8).digest()
+            if digest in digests:
+                continue
+            shingles = _shingles(content)
+            if any(
+                len(shingles & kept) > _NEAR_DUPLICATE_JACCARD * len(shingles | kept)
+                for kept in kept_shingles
+            ):
+                continue
+            part = f"[Kaynak {rank} - Sayfa {page}]\n{content}\n"
+            # Parts are joined by one newline
+            length += len(part) + bool(context_parts)
+            if max_chars is not None and length > max_chars:
+                if not context_parts:
+                    context_parts.append(part[:max_chars])
+                break
+            if max_tokens is not None and count_tokens is not None:
+                tokens += count_tokens(part)
+                if tokens > max_tokens and context_parts:
+                    break
+            digests.add(digest)
+            kept_shingles.append(shingles)
+            context_parts.append(part)
         return "\n".join(context_parts)
     
     def create_rag_prompt(self, query: str, context: str) -> str:
@@ -100,6 +312,16 @@ class RetrievalService:
 **CEVAP:**"""
         return prompt
     
+    def _answer_key(self, prompt: str) -> str:
+        """LLM cache key of a prompt under the current model settings"""
+        return self.llm_cache.make_key(
+            kind="ask",
+            prompt=prompt,
+            model=LLM_MODEL,
+            vectorstore=self.rag_pipeline.vectorstore_name,
+            **self.generation_config
+        )
+    
     def ask(
         self,
         question: str,
@@ -129,15 +351,19 @@ class RetrievalService:
         # Step 3: Create prompt
         prompt = self.create_rag_prompt(question, context)
         
-        # Step 4: Generate answer with Gemini
-        print(f"🤖 Generating answer with {LLM_MODEL}...")
-        response = self.model.generate_content(
-            prompt,
-            generation_config=self.generation_config
-        )
-        
-        answer = response.text
-        print(f"✓ Answer generated")
+        # Step 4: Generate answer with Gemini, unless this exact prompt was just answered
+        cache_key = self._answer_key(prompt)
+        answer = self.llm_cache.get(cache_key)
+        if answer is None:
+            print(f"🤖 Generating answer with {LLM_MODEL}...")
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config
+            )
+            
+            answer = response.text
+            self.llm_cache.put(cache_key, answer, self.rag_pipeline.vectorstore_name)
+            print(f"✓ Answer generated")
         
         # Prepare response
         result = {
@@ -147,11 +373,100 @@ class RetrievalService:
         }
         
         if include_sources:
-            result["sources"] = documents
+            result["sources"] = documents.to_list_of_dicts()
             result["num_sources"] = len(documents)
         
         return result
     
+    async def ask_async(
+        self,
+        question: str,
+        k: int = TOP_K_RESULTS,
+        include_sources: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Async variant of ask, for the API's event loop
+        
+        Retrieval (query embedding + FAISS search) runs in a worker thread;
+        the LLM call is awaited with generate_content_async, so a worker
+        keeps serving other requests while Gemini generates.
+        
+        Args:
+            question: User's question
+            k: Number of documents to retrieve
+            include_sources: Whether to include source documents in response
+            
+        Returns:
+            Dictionary with answer and optional sources
+        """
+        print(f"\n❓ Question: {question}")
+        
+        documents = await asyncio.to_thread(self.retrieve_documents, question, k)
+        context = self.build_context_from_docs(documents)
+        prompt = self.create_rag_prompt(question, context)
+        
+        cache_key = self._answer_key(prompt)
+        answer = await self.llm_cache.aget(cache_key)
+        if answer is None:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self.generation_config
+            )
+            answer = response.text
+            await self.llm_cache.aput(cache_key, answer, self.rag_pipeline.vectorstore_name)
+        
+        result = {
+            "question": question,
+            "answer": answer,
+            "model": LLM_MODEL
+        }
+        
+        if include_sources:
+            result["sources"] = documents.to_list_of_dicts()
+            result["num_sources"] = len(documents)
+        
+        return result
+    
+    def ask_stream(
+        self,
+        question: str,
+        k: int = TOP_K_RESULTS,
+        include_sources: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question using RAG, streaming the answer as it is generated
+        
+        Args:
+            question: User's question
+            k: Number of documents to retrieve
+            include_sources: Whether to include source documents in response
+            
+        Yields:
+            First a {"type": "meta"} event with every field of ask() except
+            the answer, then {"type": "token", "text": ...} events
+        """
+        print(f"\n❓ Question (stream): {question}")
+        
+        documents = self.retrieve_documents(question, k=k)
+        context = self.build_context_from_docs(documents)
+        prompt = self.create_rag_prompt(question, context)
+        
+        meta = {"type": "meta", "question": question, "model": LLM_MODEL}
+        if include_sources:
+            meta["sources"] = documents.to_list_of_dicts()
+            meta["num_sources"] = len(documents)
+        yield meta
+        
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self.generation_config,
+            stream=True
+        )
+        for chunk in response:
+            if chunk.text:
+                yield {"type": "token", "text": chunk.text}
+        print(f"✓ Answer streamed")
+    
     def load_vectorstore(self, vectorstore_name: str = "default"):
         """
         Load a vector store for retrieval
@@ -164,6 +479,7 @@ class RetrievalService:
 
 # Singleton instance
 _retrieval_service = None
+_retrieval_service_lock = threading.Lock()
 
 
 def get_retrieval_service() -> RetrievalService:
@@ -175,5 +491,7 @@ def get_retrieval_service() -> RetrievalService:
     """
     global _retrieval_service
     if _retrieval_service is None:
-        _retrieval_service = RetrievalService()
+        with _retrieval_service_lock:
+            if _retrieval_service is None:
+                _retrieval_service = RetrievalService()
     return _retrieval_service
@@ -0,0 +1,168 @@
+"""
+Semantic Cache for StudyRAG
+Reuses /ask answers for questions that are near-duplicates of earlier ones
+("X nedir?" vs "X'i açıkla"), skipping both retrieval and the LLM call.
+
+Enabled by default; disable it by setting:
+
+    USE_SEMANTIC_CACHE=false
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+from backend.config import SEMANTIC_CACHE_PATH, SEMCACHE_THRESHOLD
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour answer cache over question embeddings.
+
+    Each namespace (vectorstore + retrieval parameters) has its own
+    in-memory faiss.IndexFlatIP over L2-normalized question vectors, so
+    inner product equals cosine similarity. Entries are persisted in
+    SQLite and reloaded lazily per namespace.
+    """
+
+    def __init__(self, path: Path, threshold: float) -> None:
+        self.enabled = os.getenv("USE_SEMANTIC_CACHE", "true").lower() == "true"
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, faiss.IndexFlatIP] = {}
+        self._answers: Dict[str, List[Dict[str, Any]]] = {}
+
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS semcache "
+                "(namespace TEXT NOT NULL, vec BLOB NOT NULL, answer TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS semcache_namespace ON semcache (namespace)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        """Return vector as a (1, dim) L2-normalized float32 matrix."""
+        matrix = np.asarray(vector, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def _load_namespace(self, namespace: str) -> None:
+        """Build the in-memory index of a namespace from SQLite (lock held)."""
+        if namespace in self._indexes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT vec, answer FROM semcache WHERE namespace = ?",
+            (namespace,),
+        ).fetchall()
+
+        index: Optional[faiss.IndexFlatIP] = None
+        answers: List[Dict[str, Any]] = []
+        for vec, answer in rows:
+            vector = np.frombuffer(vec, dtype=np.float32).reshape(1, -1)
+            if index is None:
+                index = faiss.IndexFlatIP(vector.shape[1])
+            if vector.shape[1] != index.d:
+                continue
+            index.add(vector)
+            answers.append(json.loads(answer))
+
+        if index is not None:
+            self._indexes[namespace] = index
+            self._answers[namespace] = answers
+
+    def lookup(self, namespace: str, vector: Sequence[float]) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a question vector.
+
+        Returns:
+            A copy of the cached answer if the most similar earlier question
+            is above the similarity threshold, otherwise None
+        """
+        if not self.enabled:
+            return None
+
+        query = self._normalize(vector)
+        with self._lock:
+            self._load_namespace(namespace)
+            index = self._indexes.get(namespace)
+            if index is None or index.ntotal == 0 or index.d != query.shape[1]:
+                return None
+
+            scores, ids = index.search(query, 1)
+            if scores[0][0] <= self.threshold:
+                return None
+            return dict(self._answers[namespace][ids[0][0]])
+
+    def add(self, namespace: str, vector: Sequence[float], answer: Dict[str, Any]) -> None:
+        """Store an answer under its question vector."""
+        if not self.enabled:
+            return
+
+        normalized = self._normalize(vector)
+        with self._lock:
+            self._load_namespace(namespace)
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = faiss.IndexFlatIP(normalized.shape[1])
+                self._answers[namespace] = []
+            if index.d != normalized.shape[1]:
+                return
+
+            index.add(normalized)
+            self._answers[namespace].append(answer)
+            self._conn.execute(
+                "INSERT INTO semcache (namespace, vec, answer) VALUES (?, ?, ?)",
+                (namespace, normalized.tobytes(), json.dumps(answer, ensure_ascii=False)),
+            )
+            self._conn.commit()
+
+    def clear(self, vectorstore_name: str) -> None:
+        """Drop every namespace that belongs to a vectorstore."""
+        prefix = f"{vectorstore_name}|"
+        with self._lock:
+            for namespace in [ns for ns in self._indexes if ns.startswith(prefix)]:
+                del self._indexes[namespace]
+                del self._answers[namespace]
+            self._conn.execute(
+                "DELETE FROM semcache WHERE substr(namespace, 1, ?) = ?",
+                (len(prefix), prefix),
+            )
+            self._conn.commit()
+
+
+def cache_namespace(vectorstore_name: Optional[str], k: int, include_sources: bool) -> str:
+    """Namespace for answers produced from a vectorstore with given parameters."""
+    return f"{vectorstore_name}|k={k}|sources={int(include_sources)}"
+
+
+# Singleton instance
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    """
+    Get or create singleton semantic cache instance.
+
+    Returns:
+        SemanticCache instance
+    """
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(SEMANTIC_CACHE_PATH, SEMCACHE_THRESHOLD)
+    return _semantic_cache
@@ -0,0 +1,570 @@
+let messages = [];
+// Chat summaries, newest first; a chat's messages are read from IndexedDB when it is opened
+let chats = [];
+const MAX_CHATS = 20;
+let currentChatId = null;
+// messages[unsavedFrom..] are not in IndexedDB yet
+let unsavedFrom = 0;
+
+// Looked up once; the script is deferred, so the page is already parsed
+const els = Object.freeze(Object.fromEntries([
+    'chatContainer', 'chatInput', 'fileInput', 'noHistory', 'pdfBadge', 'planDays', 'planFocus', 'planMinutes',
+    'planModal', 'planWithQuiz', 'quizDiff', 'quizModal', 'quizNum', 'quizTopic', 'quizType',
+    'messageTemplate', 'actionsTemplate', 'typingTemplate', 'historySkeleton',
+].map(id => [id, document.getElementById(id)])));
+
+// One element per chat id: only added, removed, retitled or (de)activated chats touch the DOM
+const historyEls = new Map();
+let activeHistoryId = null;
+
+// Long chats keep only the newest RENDER_WINDOW messages in the DOM up front
+const RENDER_WINDOW = 30;
+const ESTIMATED_MESSAGE_HEIGHT = 120;
+const messageHeights = new Map();
+// Formatted message nodes by message id: switching back to a chat clones them instead
+// of re-running formatToNodes. Entries remember the content they were built from.
+const RENDER_CACHE_MAX = 1000;
+const renderedCache = new Map();
+// randomUUID only exists in secure contexts; the page may be served over plain http on a LAN
+const messageId = () => crypto.randomUUID?.() ?? `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+const windowObserver = new IntersectionObserver(entries => onWindowChange(entries), { root: els.chatContainer, rootMargin: '800px 0px' });
+
+// Answers per (question, k, include_sources); identical in-flight asks share one request
+const ASK_CACHE_MAX = 32;
+const askCache = new Map();
+const askInflight = new Map();
+// One live request per action: a new quiz/plan click aborts the stale one
+const controllers = {};
+// Every live request, so switching chats cancels replies meant for the old one
+const inflight = new Set();
+
+function freshSignal(name) {
+    if(controllers[name]) { controllers[name].abort(); inflight.delete(controllers[name]); }
+    controllers[name] = new AbortController();
+    inflight.add(controllers[name]);
+    return controllers[name].signal;
+}
+
+function abortAll() {
+    inflight.forEach(controller => controller.abort());
+    inflight.clear();
+}
+
+// Built once: each call clones a template and only supplies body and signal
+const JSON_HEADERS = new Headers({ 'Content-Type': 'application/json' });
+const POST_TEMPLATES = Object.fromEntries(['/ask/stream', '/batch', '/generate-quiz', '/study-plan']
+    .map(url => [url, new Request(url, { method: 'POST', headers: JSON_HEADERS })]));
+
+function postJSON(url, payload, signal) {
+    return fetch(POST_TEMPLATES[url], { body: JSON.stringify(payload), signal });
+}
+
+async function streamAsk(payload, onToken) {
+    const controller = new AbortController();
+    inflight.add(controller);
+    try { return await readAskStream(payload, onToken, controller.signal); }
+    finally { inflight.delete(controller); }
+}
+
+async function readAskStream(payload, onToken, signal) {
+    const res = await postJSON('/ask/stream', payload, signal);
+    if(!res.ok) { const data = await res.json(); throw new Error(data.detail); }
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    const data = { answer: '' };
+    let buffer = '';
+    while(true) {
+        const { done, value } = await reader.read();
+        if(done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while((sep = buffer.indexOf('\n\n')) >= 0) {
+            const line = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            if(!line.startsWith('data: ')) continue;
+            const event = JSON.parse(line.slice(6));
+            if(event.type === 'meta') Object.assign(data, event);
+            else if(event.type === 'token') { data.answer += event.text; onToken(event.text); }
+            else if(event.type === 'error') throw new Error(event.detail);
+        }
+    }
+    delete data.type;
+    return data;
+}
+
+function askCached(payload, onToken) {
+    const key = JSON.stringify(payload);
+    if(askCache.has(key)) {
+        const data = askCache.get(key);
+        askCache.delete(key); askCache.set(key, data);
+        return Promise.resolve(data);
+    }
+    if(askInflight.has(key)) return askInflight.get(key);
+    const request = streamAsk(payload, onToken)
+        .then(data => {
+            askCache.set(key, data);
+            if(askCache.size > ASK_CACHE_MAX) askCache.delete(askCache.keys().next().value);
+            return data;
+        })
+        .finally(() => askInflight.delete(key));
+    askInflight.set(key, request);
+    return request;
+}
+
+els.fileInput.addEventListener('change', e => { if(e.target.files[0]) uploadPDF(e.target.files[0]); });
+
+const UPLOAD_CHUNK_SIZE = 1024 * 1024;
+const UPLOAD_PARALLELISM = 4;
+
+// PUT one piece, retrying network errors and 5xx responses up to twice
+async function putPiece(headers, file, offset, end) {
+    const piece = { method: 'PUT', headers: { ...headers, 'Content-Range': `bytes ${offset}-${end}/${file.size}` }, body: file.slice(offset, end + 1) };
+    for(let attempt = 0; ; attempt++) {
+        try { const res = await fetch('/upload-chunk', piece); if(res.ok || res.status < 500 || attempt >= 2) return res; }
+        catch(e) { if(attempt >= 2) throw e; }
+    }
+}
+
+async function uploadPDF(file) {
+    if(!file.name.endsWith('.pdf')) { alert('Sadece PDF yükleyebilirsin'); return; }
+    const label = `📄 ${file.name} yükleniyor...`;
+    const bubble = addMessage('user', label).querySelector('.message-bubble');
+    const progress = document.createElement('div');
+    progress.className = 'upload-progress';
+    progress.innerHTML = '<div class="upload-progress-bar"></div>';
+    bubble.appendChild(progress);
+    const bar = progress.firstChild;
+    
+    // Sent in 1 MiB pieces, UPLOAD_PARALLELISM at a time. The upload id is remembered per file,
+    // so picking the same file after an interrupted upload only sends the pieces the server lacks.
+    const resumeKey = `studyrag_upload:${file.name}:${file.size}:${file.lastModified}`;
+    const uploadId = localStorage.getItem(resumeKey) || Date.now().toString(36) + Math.random().toString(36).slice(2);
+    localStorage.setItem(resumeKey, uploadId);
+    const headers = { 'X-Upload-Id': uploadId, 'X-Filename': encodeURIComponent(file.name), 'X-Vectorstore-Name': 'default' };
+    
+    try {
+        if(!file.size) throw new Error('Dosya boş');
+        const { ranges } = await fetch(`/upload-chunk/${uploadId}`).then(res => res.json()).catch(() => ({ ranges: [] }));
+        const pending = [];
+        for(let offset = 0; offset < file.size; offset += UPLOAD_CHUNK_SIZE) {
+            const end = Math.min(offset + UPLOAD_CHUNK_SIZE, file.size) - 1;
+            if(!ranges.some(([start, stop]) => start <= offset && end <= stop)) pending.push([offset, end]);
+        }
+        let sent = file.size - pending.reduce((total, [offset, end]) => total + end - offset + 1, 0);
+        let data;
+        const worker = async () => {
+            while(pending.length) {
+                const [offset, end] = pending.shift();
+                const res = await putPiece(headers, file, offset, end);
+                const body = await res.json();
+                // A failed piece stops the other workers too
+                if(!res.ok) { pending.length = 0; throw new Error(body.detail); }
+                if('num_chunks' in body) data = body;
+                sent += end - offset + 1;
+                bar.style.width = `${Math.round(sent / file.size * 100)}%`;
+            }
+        };
+        await Promise.all(Array.from({ length: UPLOAD_PARALLELISM }, worker));
+        localStorage.removeItem(resumeKey);
+        if(!data) throw new Error('Yükleme tamamlanamadı, dosyayı tekrar seç');
+        progress.remove();
+        askCache.clear();
+        els.pdfBadge.textContent = `📄 ${file.name}`;
+        els.pdfBadge.classList.add('show');
+        addMessage('assistant', `✅ **${file.name}** başarıyla yüklendi!\n\n${data.num_chunks} parçaya bölündü. Artık sorularını sorabilirsin.`);
+        scheduleSave();
+    } catch(e) {
+        // Network failures keep the upload id for a resume; server rejections start over next time
+        if(!(e instanceof TypeError)) localStorage.removeItem(resumeKey);
+        progress.remove();
+        addMessage('assistant', '❌ Hata: ' + e.message);
+    }
+}
+
+function newChat() {
+    abortAll();
+    if(messages.length > 0) saveChat();
+    messages = [];
+    unsavedFrom = 0;
+    windowObserver.disconnect();
+    currentChatId = Date.now().toString();
+    els.chatContainer.innerHTML = `<div class="welcome"><h2>StudyRAG'e Hoş Geldin! 👋</h2><p>📎 butonuyla PDF yükle ve soru sormaya başla</p></div>`;
+    renderHistory();
+}
+
+// Chats persist in IndexedDB: a 'chats' store of { id, title, timestamp } and a 'messages'
+// store keyed by [chatId, idx], so a save writes only the messages added since the last one
+const chatDB = new Promise((resolve, reject) => {
+    const request = indexedDB.open('studyrag', 2);
+    request.onupgradeneeded = ({ oldVersion }) => {
+        if(oldVersion < 1) {
+            request.result.createObjectStore('chats', { keyPath: 'id' });
+            request.result.createObjectStore('messages', { keyPath: ['chatId', 'idx'] });
+        }
+        if(oldVersion < 2) request.transaction.objectStore('chats').createIndex('timestamp', 'timestamp');
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+});
+
+async function dbTransaction(mode, work) {
+    const tx = (await chatDB).transaction(['chats', 'messages'], mode);
+    const request = work(tx.objectStore('chats'), tx.objectStore('messages'));
+    await new Promise((resolve, reject) => { tx.oncomplete = resolve; tx.onerror = tx.onabort = () => reject(tx.error); });
+    return request?.result;
+}
+
+const chatMessagesRange = id => IDBKeyRange.bound([id, 0], [id, Infinity]);
+
+function writeChat(chat, fromIdx) {
+    return dbTransaction('readwrite', (chatStore, messageStore) => {
+        chatStore.put({ id: chat.id, title: chat.title, timestamp: chat.timestamp });
+        for(let idx = fromIdx; idx < chat.messages.length; idx++) {
+            const { id, role, content } = chat.messages[idx];
+            messageStore.put({ chatId: chat.id, idx, id, role, content });
+        }
+    });
+}
+
+function deleteChat(id) {
+    return dbTransaction('readwrite', (chatStore, messageStore) => { chatStore.delete(id); messageStore.delete(chatMessagesRange(id)); });
+}
+
+async function readMessages(id) {
+    const rows = await dbTransaction('readonly', (chatStore, messageStore) => messageStore.getAll(chatMessagesRange(id)));
+    return rows.map(({ id, role, content }) => ({ id, role, content }));
+}
+
+// Newest `limit` chat summaries, read in order off the timestamp index
+async function readRecentChats(limit) {
+    const recent = [];
+    await dbTransaction('readonly', chatStore => {
+        const cursor = chatStore.index('timestamp').openCursor(null, 'prev');
+        cursor.onsuccess = () => { if(cursor.result && recent.push(cursor.result.value) < limit) cursor.result.continue(); };
+    });
+    return recent;
+}
+
+// History hydrates after the page is painted; the sidebar shows a skeleton until then
+async function initChats() {
+    // One-time move of chats saved by the localStorage version of this page
+    const legacy = localStorage.getItem('studyrag_chats');
+    if(legacy) {
+        for(const chat of JSON.parse(legacy)) await writeChat(chat, 0);
+        localStorage.removeItem('studyrag_chats');
+    }
+    const recent = await readRecentChats(MAX_CHATS);
+    // Keep a chat started before hydration finished
+    const started = new Set(chats.map(chat => chat.id));
+    chats = [...chats, ...recent.filter(chat => !started.has(chat.id))].slice(0, MAX_CHATS);
+    els.historySkeleton.remove();
+    renderHistory();
+}
+
+// Replies call scheduleSave, so a burst of messages costs one write once the page is idle;
+// chat switches and hiding the page flush it right away through saveChat
+const whenIdle = window.requestIdleCallback?.bind(window) || (callback => setTimeout(callback, 200));
+const cancelIdle = window.cancelIdleCallback?.bind(window) || clearTimeout;
+let saveHandle = null;
+
+function scheduleSave() {
+    if(saveHandle === null) saveHandle = whenIdle(() => { saveHandle = null; saveChat(); }, { timeout: 1000 });
+}
+
+function saveChat() {
+    if(saveHandle !== null) { cancelIdle(saveHandle); saveHandle = null; }
+    if(messages.length === 0) return;
+    const title = messages[0].content.substring(0, 30) + (messages[0].content.length > 30 ? '...' : '');
+    const id = currentChatId || Date.now().toString();
+    let chat = chats.find(c => c.id === id);
+    // The sidebar only shows titles and the active chat
+    const historyChanged = !chat || chat.title !== title || activeHistoryId !== id;
+    if(chat) Object.assign(chat, { title, messages, timestamp: Date.now() });
+    else { chat = { id, title, messages, timestamp: Date.now() }; chats.unshift(chat); }
+    chats.splice(MAX_CHATS).forEach(old => deleteChat(old.id));
+    writeChat(chat, unsavedFrom).catch(e => console.error('Sohbet kaydedilemedi', e));
+    unsavedFrom = messages.length;
+    currentChatId = id;
+    if(historyChanged) renderHistory();
+}
+
+async function loadChat(id) {
+    const chat = chats.find(c => c.id === id);
+    if(!chat) return;
+    abortAll();
+    if(messages.length > 0 && currentChatId !== id) saveChat();
+    chat.messages ??= await readMessages(id);
+    currentChatId = id;
+    messages = chat.messages;
+    unsavedFrom = messages.length;
+    windowObserver.disconnect();
+    messageHeights.clear();
+    // Built off-document and attached once; only the newest messages become real nodes
+    const fragment = document.createDocumentFragment();
+    const firstLive = Math.max(0, messages.length - RENDER_WINDOW);
+    messages.forEach((m, i) => {
+        if(i < firstLive) fragment.appendChild(messagePlaceholder(i));
+        else renderMessage(m, i, fragment);
+    });
+    els.chatContainer.replaceChildren(fragment);
+    scrollToEnd();
+    renderHistory();
+}
+
+// Older messages of a loaded chat are windowed: a placeholder of the message's
+// last measured height (or a guess) stands in until it scrolls near the viewport,
+// and a message that scrolls far away is swapped back for one.
+function messagePlaceholder(idx) {
+    const placeholder = document.createElement('div');
+    placeholder.className = 'message-placeholder';
+    placeholder.dataset.idx = idx;
+    placeholder.style.height = `${messageHeights.get(idx) || ESTIMATED_MESSAGE_HEIGHT}px`;
+    windowObserver.observe(placeholder);
+    return placeholder;
+}
+
+function onWindowChange(entries) {
+    entries.forEach(({ target, isIntersecting }) => {
+        const idx = Number(target.dataset.idx);
+        const isPlaceholder = target.classList.contains('message-placeholder');
+        if(isIntersecting !== isPlaceholder || !messages[idx]) return;
+        windowObserver.unobserve(target);
+        if(isPlaceholder) {
+            const div = renderMessage(messages[idx], idx, document.createDocumentFragment());
+            div.dataset.idx = idx;
+            target.replaceWith(div);
+            windowObserver.observe(div);
+        } else {
+            messageHeights.set(idx, target.offsetHeight);
+            target.replaceWith(messagePlaceholder(idx));
+        }
+    });
+}
+
+function renderHistory() {
+    els.noHistory.style.display = chats.length === 0 ? 'block' : 'none';
+    const ids = new Set(chats.map(chat => chat.id));
+    historyEls.forEach((el, id) => { if(!ids.has(id)) { el.remove(); historyEls.delete(id); } });
+    // chats is newest first and new chats are only ever prepended, so new items go right after the placeholder
+    const fragment = document.createDocumentFragment();
+    chats.forEach(chat => {
+        let el = historyEls.get(chat.id);
+        if(!el) {
+            el = document.createElement('div');
+            el.className = 'history-item';
+            el.onclick = () => loadChat(chat.id);
+            historyEls.set(chat.id, el);
+            fragment.appendChild(el);
+        }
+        if(el.dataset.title !== chat.title) {
+            el.dataset.title = chat.title;
+            el.innerHTML = '<span>💬</span> ';
+            el.append(chat.title);
+        }
+    });
+    els.noHistory.after(fragment);
+    if(activeHistoryId !== currentChatId) {
+        historyEls.get(activeHistoryId)?.classList.remove('active');
+        activeHistoryId = currentChatId;
+    }
+    historyEls.get(currentChatId)?.classList.add('active');
+}
+
+function handleKeyDown(e) { if(e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); sendMessage(); } }
+
+async function sendMessage() {
+    const input = els.chatInput;
+    const text = input.value.trim();
+    if(!text) return;
+    input.value = '';
+    input.parentNode.dataset.replicatedValue = '';
+    addMessage('user', text);
+    showTyping();
+    
+    // Tokens are appended as plain text while streaming; formatted once at the end
+    let streamed = null;
+    const onToken = piece => {
+        if(!streamed) {
+            hideTyping();
+            const bubble = addMessage('assistant', '').querySelector('.message-bubble');
+            streamed = { bubble, text: bubble.appendChild(document.createTextNode('')), idx: messages.length - 1 };
+        }
+        streamed.text.appendData(piece);
+        scrollToEnd();
+    };
+    
+    try {
+        const data = await askCached({ question: text, k: 4, include_sources: true }, onToken);
+        hideTyping();
+        let answer = data.answer;
+        // Several chunks often come from one page; list each page once
+        if(data.sources?.length) answer += '\n\n📚 **Kaynaklar:** ' + [...new Set(data.sources.map(s => s.page || '?'))].map(page => `Sayfa ${page}`).join(', ');
+        if(streamed) {
+            messages[streamed.idx].content = answer;
+            unsavedFrom = Math.min(unsavedFrom, streamed.idx);
+            streamed.bubble.replaceChildren(formatToNodes(answer));
+        } else addMessage('assistant', answer);
+        scheduleSave();
+    } catch(e) {
+        // Aborted by a chat switch: the bubble belongs to a chat that is gone
+        if(e.name === 'AbortError') return;
+        hideTyping(); addMessage('assistant', '❌ Hata: ' + e.message);
+    }
+}
+
+// Scrolls the newest message into view; unlike assigning scrollTop = scrollHeight
+// there is no layout read here. Calls within one frame (a message plus its tokens,
+// or a burst of streamed tokens) share a single scroll at the next animation frame.
+let scrollFrame = 0;
+function scrollToEnd() {
+    if(scrollFrame) return;
+    scrollFrame = requestAnimationFrame(() => {
+        scrollFrame = 0;
+        els.chatContainer.lastElementChild?.scrollIntoView({ block: 'end' });
+    });
+}
+
+function addMessage(role, content) {
+    const container = els.chatContainer;
+    const welcome = container.querySelector('.welcome');
+    if(welcome) welcome.remove();
+    const message = { id: messageId(), role, content };
+    messages.push(message);
+    const div = renderMessage(message, messages.length - 1);
+    scrollToEnd();
+    return div;
+}
+
+// Bubbles are cloned from <template>s in the page instead of parsed from HTML strings
+function messageShell(role) {
+    const div = els.messageTemplate.content.firstElementChild.cloneNode(true);
+    div.classList.add(role);
+    div.firstElementChild.textContent = role === 'assistant' ? '🤖' : '👤';
+    return div;
+}
+
+// Messages saved before ids existed get one on first render
+function renderedMessage(message) {
+    message.id ??= messageId();
+    const cached = renderedCache.get(message.id);
+    if(cached?.content === message.content) {
+        renderedCache.delete(message.id); renderedCache.set(message.id, cached);
+        return cached.node;
+    }
+    const node = messageShell(message.role);
+    node.querySelector('.message-bubble').appendChild(formatToNodes(message.content));
+    if(message.role === 'assistant') node.lastElementChild.appendChild(els.actionsTemplate.content.firstElementChild.cloneNode(true));
+    renderedCache.set(message.id, { content: message.content, node });
+    if(renderedCache.size > RENDER_CACHE_MAX) renderedCache.delete(renderedCache.keys().next().value);
+    return node;
+}
+
+// The cached node is never attached itself; clones don't carry the click handlers, so they are bound here
+function renderMessage(message, idx, container = els.chatContainer) {
+    const div = renderedMessage(message).cloneNode(true);
+    if(message.role === 'assistant') {
+        const actions = div.lastElementChild.lastElementChild;
+        actions.children[0].onclick = () => copyText(idx);
+        actions.children[1].onclick = () => downloadPDF(idx);
+    }
+    container.appendChild(div);
+    return div;
+}
+
+// **bold** within a line and line breaks, built as DOM nodes: no regex, no HTML parsing,
+// and message text can never inject markup
+function formatToNodes(text) {
+    const fragment = document.createDocumentFragment();
+    text.split('\n').forEach((line, n) => {
+        if(n > 0) fragment.appendChild(document.createElement('br'));
+        let pos = 0;
+        while(pos < line.length) {
+            const open = line.indexOf('**', pos);
+            const close = open < 0 ? -1 : line.indexOf('**', open + 2);
+            if(close < 0) { fragment.appendChild(document.createTextNode(line.slice(pos))); break; }
+            if(open > pos) fragment.appendChild(document.createTextNode(line.slice(pos, open)));
+            const strong = document.createElement('strong');
+            strong.textContent = line.slice(open + 2, close);
+            fragment.appendChild(strong);
+            pos = close + 2;
+        }
+    });
+    return fragment;
+}
+function showTyping() { const c = els.chatContainer; const d = messageShell('assistant'); d.id = 'typingMsg'; d.querySelector('.message-bubble').appendChild(els.typingTemplate.content.cloneNode(true)); c.appendChild(d); scrollToEnd(); }
+function hideTyping() { const el = document.getElementById('typingMsg'); if(el) el.remove(); }
+function copyText(idx) { navigator.clipboard.writeText(messages[idx].content); }
+// jsPDF (~350 KB) is fetched on the first PDF download, not on every page load
+let jsPDFModule = null;
+async function downloadPDF(idx) {
+    jsPDFModule ??= import('https://cdn.jsdelivr.net/npm/jspdf@2.5.1/+esm').catch(e => { jsPDFModule = null; throw e; });
+    const { jsPDF } = await jsPDFModule;
+    const doc = new jsPDF();
+    doc.setFont('helvetica'); doc.setFontSize(12);
+    doc.text(doc.splitTextToSize(messages[idx].content.replace(/\*\*/g, ''), 180), 15, 20);
+    doc.save('studyrag-cevap.pdf');
+}
+
+function openQuizModal() { els.quizModal.classList.add('show'); }
+function openPlanModal() { els.planModal.classList.add('show'); }
+function closeModals() { document.querySelectorAll('.modal-overlay').forEach(m => m.classList.remove('show')); }
+
+function quizPayload() { return { quiz_type: els.quizType.value, num_questions: parseInt(els.quizNum.value), difficulty: els.quizDiff.value, topic: els.quizTopic.value || null }; }
+function planPayload() { return { days: parseInt(els.planDays.value), daily_minutes: parseInt(els.planMinutes.value), focus: els.planFocus.value || null }; }
+
+function formatQuiz(data) {
+    let text = `📝 **Quiz** (${data.difficulty} - ${data.num_questions} soru)\n\n`;
+    data.questions.forEach((q, i) => { text += `**${i+1}. ${q.question}**\n`; if(q.choices) text += q.choices.join('\n') + '\n'; text += `✅ ${q.correct_answer}\n📖 ${q.explanation}\n\n`; });
+    return text;
+}
+
+function formatPlan(data) {
+    let text = `📅 **${data.total_days} Günlük Plan**\n${data.strategy_summary}\n\n`;
+    data.days.forEach(d => { text += `**Gün ${d.day_index}: ${d.title}** (${d.estimated_minutes} dk)\n📌 ${d.focus_topics.join(', ')}\n🎯 ${d.goals.join(', ')}\n\n`; });
+    return text;
+}
+
+// Several operations in one round-trip; results come back in request order
+async function batch(ops, signal) {
+    const res = await postJSON('/batch', { ops }, signal);
+    const data = await res.json(); if(!res.ok) throw new Error(data.detail);
+    return data.results;
+}
+
+async function generateQuiz() {
+    closeModals(); addMessage('user', '📝 Quiz oluştur'); showTyping();
+    try {
+        const res = await postJSON('/generate-quiz', quizPayload(), freshSignal('quiz'));
+        const data = await res.json(); hideTyping(); if(!res.ok) throw new Error(data.detail);
+        addMessage('assistant', formatQuiz(data)); scheduleSave();
+    } catch(e) { hideTyping(); if(e.name !== 'AbortError') addMessage('assistant', '❌ ' + e.message); }
+}
+
+async function generatePlan() {
+    const withQuiz = els.planWithQuiz.checked;
+    closeModals(); addMessage('user', withQuiz ? '📅 Çalışma planı + 📝 Quiz' : '📅 Çalışma planı'); showTyping();
+    try {
+        if(withQuiz) {
+            const [plan, quiz] = await batch([{ op: 'plan', ...planPayload() }, { op: 'quiz', ...quizPayload() }], freshSignal('plan'));
+            hideTyping();
+            addMessage('assistant', plan.ok ? formatPlan(plan.result) : '❌ ' + plan.detail);
+            addMessage('assistant', quiz.ok ? formatQuiz(quiz.result) : '❌ ' + quiz.detail);
+            scheduleSave();
+            return;
+        }
+        const res = await postJSON('/study-plan', planPayload(), freshSignal('plan'));
+        const data = await res.json(); hideTyping(); if(!res.ok) throw new Error(data.detail);
+        addMessage('assistant', formatPlan(data)); scheduleSave();
+    } catch(e) { hideTyping(); if(e.name !== 'AbortError') addMessage('assistant', '❌ ' + e.message); }
+}
+
+// The textarea grows through the CSS grid mirror, so nothing here reads layout. Input events
+// that leave the text as it was (some browsers fire them for IME and selection changes) skip
+// the attribute write, which would otherwise restyle and relayout the mirror for nothing.
+els.chatInput.addEventListener('input', function() {
+    const wrap = this.parentNode;
+    if(wrap.dataset.replicatedValue !== this.value) wrap.dataset.replicatedValue = this.value;
+});
+
+document.addEventListener('visibilitychange', () => { if(document.visibilityState === 'hidden' && saveHandle !== null) saveChat(); });
+initChats().catch(e => { els.historySkeleton.remove(); console.error('Sohbet geçmişi yüklenemedi', e); });
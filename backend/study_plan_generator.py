@@ -5,15 +5,374 @@ Uses RAG context and Google Gemini to build structured study plans.
 
 from __future__ import annotations
 
-import json
+import asyncio
+import datetime
+import functools
+import hashlib
+import logging
 import os
-from typing import Any, Dict, Optional
+import threading
+import textwrap
+import time
+from typing import (
+    TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+)
 
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
+import numpy as np
+import orjson
 
-from backend.config import GOOGLE_API_KEY, LLM_MODEL, TEMPERATURE, MAX_TOKENS, TOP_K_RESULTS
-from backend.retrieval_service import get_retrieval_service
+from backend.config import (
+    LLM_MODEL,
+    TEMPERATURE,
+    MAX_TOKENS,
+    MAX_CONTEXT_CHARS,
+    MAX_CONTEXT_TOKENS,
+    TOP_K_RESULTS,
+    GEMINI_MAX_CONCURRENCY,
+    PLAN_CONTEXT_CACHE,
+    PLAN_CONTEXT_CACHE_TTL,
+    PLAN_JSON_SCHEMA,
+)
+from backend.json_stream import JSONArrayItemStream
+from backend.llm_cache import get_llm_cache
+from backend.llm_client import get_llm_model
+from backend.retrieval_service import RetrievedBatch, get_retrieval_service
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+    from google.generativeai import caching
+
+logger = logging.getLogger(__name__)
+
+
+# Plan prompts are assembled from constant parts, static first: the coach
+# role, task and JSON schema (_PLAN_INSTRUCTIONS, sent as the model's
+# system instruction), then the retrieved context, then the per-request
+# preferences. Every request on a PDF thus starts with the same long
+# prefix, which Gemini's implicit prefix cache can reuse, and the
+# instructions + context are exactly what a context cache holds.
+_PLAN_INSTRUCTIONS_HEAD = """Sen bir uzman ders koçu ve eğitim planlayıcısın.
+Görevin, verilen ders notu BAĞLAMI ve KULLANICI TERCİHLERİNE göre detaylı bir çalışma planı üretmek."""
+
+_PLAN_GOALS = """İSTEK:
+- Konuyu mantıklı alt başlıklara böl
+- Önce temeller, sonra orta seviye, en sonda zor konular gelsin
+- Her gün için hedefleri ve odak konuları yaz
+- Zor / önemli konulara daha fazla süre ayır"""
+
+_BATCH_GOAL = "\n- Her KULLANICI TERCİHLERİ bloğu için ayrı bir plan üret"
+
+_JSON_ONLY = """SADECE AŞAĞIDAKİ JSON ŞEMASINA UYAN GEÇERLİ BİR JSON DÖNDÜR.
+Açıklama veya markdown yazma, sadece JSON."""
+
+_PLAN_SCHEMA = """{
+  "total_days": int,                // toplam gün sayısı
+  "daily_minutes": int,             // hedef günlük süre (dakika)
+  "strategy_summary": str,          // genel stratejinin kısa özeti (Türkçe)
+  "days": [
+    {
+      "day_index": int,             // 1..N
+      "title": str,                 // gün başlığı (örn. "Temel tanımlar")
+      "focus_topics": [str, ...],   // o gün çalışılacak ana alt konular
+      "goals": [str, ...],          // o günün öğrenme hedefleri
+      "estimated_minutes": int,     // o gün için önerilen süre
+      "notes": str                  // ek tavsiyeler (kısa)
+    }
+  ]
+}"""
+
+_PLAN_BATCH_SCHEMA = (
+    "{\n"
+    '  "plans": [  // KULLANICI TERCİHLERİ 1..N için birer plan, aynı sırayla\n'
+    + textwrap.indent(_PLAN_SCHEMA, "    ")
+    + "\n  ]\n}"
+)
+
+# The same shape as structured output (response_schema): with
+# PLAN_JSON_SCHEMA on, Gemini is constrained to it and the prose schema
+# and JSON-only instructions are left out of the prompt
+STUDY_PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "total_days": {"type": "integer", "description": "toplam gün sayısı"},
+        "daily_minutes": {"type": "integer", "description": "hedef günlük süre (dakika)"},
+        "strategy_summary": {
+            "type": "string",
+            "description": "genel stratejinin kısa özeti (Türkçe)",
+        },
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "day_index": {"type": "integer", "description": "1..N"},
+                    "title": {"type": "string", "description": "gün başlığı (örn. \"Temel tanımlar\")"},
+                    "focus_topics": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "o gün çalışılacak ana alt konular",
+                    },
+                    "goals": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "o günün öğrenme hedefleri",
+                    },
+                    "estimated_minutes": {"type": "integer", "description": "o gün için önerilen süre"},
+                    "notes": {"type": "string", "description": "ek tavsiyeler (kısa)"},
+                },
+                "required": ["day_index", "title", "focus_topics", "goals", "estimated_minutes"],
+            },
+        },
+    },
+    "required": ["total_days", "daily_minutes", "strategy_summary", "days"],
+}
+
+STUDY_PLAN_BATCH_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "plans": {
+            "type": "array",
+            "items": STUDY_PLAN_SCHEMA,
+            "description": "KULLANICI TERCİHLERİ 1..N için birer plan, aynı sırayla",
+        },
+    },
+    "required": ["plans"],
+}
+
+
+def _schema_fields(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """A JSON schema dict in genai.protos.Schema field names ("type" -> "type_", enum names)."""
+    fields: Dict[str, Any] = {}
+    for name, value in schema.items():
+        if name == "type":
+            fields["type_"] = value.upper()
+        elif name == "properties":
+            fields[name] = {prop: _schema_fields(sub) for prop, sub in value.items()}
+        elif name == "items":
+            fields[name] = _schema_fields(value)
+        else:
+            fields[name] = value
+    return fields
+
+
+@functools.lru_cache(maxsize=None)
+def _response_schema(batch: bool) -> genai.protos.Schema:
+    """
+    STUDY_PLAN_SCHEMA (or the batch schema) as a Schema proto, built once.
+
+    Passed as a dict, the SDK rebuilds the proto on every request; the SDK
+    is only imported on first use so MOCK mode never loads it.
+    """
+    import google.generativeai as genai
+
+    return genai.protos.Schema(
+        _schema_fields(STUDY_PLAN_BATCH_SCHEMA if batch else STUDY_PLAN_SCHEMA)
+    )
+
+
+_CONTEXT_LABEL = "BAĞLAM (ders notlarından alınmış parçalar):\n"
+
+# Prompt parts keyed by whether Gemini enforces the schema itself
+# (response_schema) or the prompt has to spell it out
+_PLAN_INSTRUCTIONS = {
+    False: (
+        _PLAN_INSTRUCTIONS_HEAD + "\n\n" + _PLAN_GOALS + "\n\n" + _JSON_ONLY
+        + "\n\nJSON ŞEMASI:\n" + _PLAN_SCHEMA
+    ),
+    True: _PLAN_INSTRUCTIONS_HEAD + "\n\n" + _PLAN_GOALS,
+}
+_PLAN_SUFFIXES = {
+    False: (
+        "\n\nBu tercihlere göre planı, talimatlardaki JSON şemasına uyan geçerli bir JSON olarak döndür."
+        "\nAçıklama veya markdown yazma, sadece JSON."
+    ),
+    True: "\n\nBu tercihlere göre planı üret.",
+}
+
+# Several plans in one reply (generate_plans_batch): the preferences are
+# numbered blocks and the schema wraps one plan per block
+_PLAN_BATCH_PREFIXES = {
+    False: (
+        _PLAN_INSTRUCTIONS_HEAD + "\n\n" + _PLAN_GOALS + _BATCH_GOAL + "\n\n" + _JSON_ONLY
+        + "\n\nJSON ŞEMASI:\n" + _PLAN_BATCH_SCHEMA + "\n\n" + _CONTEXT_LABEL
+    ),
+    True: _PLAN_INSTRUCTIONS_HEAD + "\n\n" + _PLAN_GOALS + _BATCH_GOAL + "\n\n" + _CONTEXT_LABEL,
+}
+_PLAN_BATCH_SUFFIXES = {
+    False: (
+        "\n\nHer tercih bloğu için sırasıyla bir plan içeren, talimatlardaki JSON şemasına uyan"
+        " geçerli bir JSON döndür.\nAçıklama veya markdown yazma, sadece JSON."
+    ),
+    True: "\n\nHer tercih bloğu için sırasıyla bir plan üret.",
+}
+
+# Gemini only caches contents above a minimum token count (~2048 tokens)
+_MIN_CACHED_CONTEXT_CHARS = 8000
+# Context caches in use at once (e.g. parallel plans with different focuses)
+_MAX_CONTEXT_CACHES = 8
+
+# (vectorstore name, context digest, structured output) of a context cache
+_ContextKey = Tuple[Optional[str], str, bool]
+
+
+# MMR relevance/diversity trade-off when picking plan context chunks
+_MMR_LAMBDA = 0.6
+
+# Retrieval query when no focus is given
+_OVERVIEW_QUERY = "Bu ders notlarının ana konuları ve öğrenme sırası nedir?"
+
+PlanArgs = Tuple[int, int, Optional[str]]
+
+
+def _preferences_block(
+    days: int,
+    daily_minutes: int,
+    focus: Optional[str],
+    number: Optional[int] = None,
+) -> str:
+    """The KULLANICI TERCİHLERİ part of a plan prompt, numbered in batch prompts."""
+    label = "KULLANICI TERCİHLERİ" if number is None else f"KULLANICI TERCİHLERİ {number}"
+    return (
+        f"{label}:\n"
+        f"- Toplam gün: {days}\n"
+        f"- Günlük süre (dakika): {daily_minutes}\n"
+        f"- Özel odak: {focus or 'belirtilmedi'}"
+    )
+
+
+class _MockDay(NamedTuple):
+    """One mock plan day; "{t}" in the strings stands for the topic."""
+    title: str
+    focus_topics: Tuple[str, ...]
+    goals: Tuple[str, ...]
+
+
+# Day templates of mock plans per phase, cycled through day by day
+_MOCK_VARIANTS: Dict[str, Tuple[_MockDay, ...]] = {
+    "temel": (
+        _MockDay(
+            "{t} için temel kavramlar",
+            ("{t} ile ilgili tanımlar", "{t} için temel formüller"),
+            (
+                "Ders notlarındaki ilgili teorik bölümü dikkatlice oku.",
+                "Önemli tanım ve formülleri kendi cümlelerinle tekrar yaz.",
+                "Kısa bir özet çıkar (maksimum 1 sayfa).",
+            ),
+        ),
+        _MockDay(
+            "{t} grafik ve yorumlama",
+            ("{t} ile ilgili grafikler", "Grafikler üzerinden fiziksel/anlam yorumları"),
+            (
+                "Notlardaki grafik örneklerini incele ve kendi grafiğini çiz.",
+                "Grafik üzerinden en az 3 yorum cümlesi yaz.",
+                "Grafik-tablo ilişkisini kurmaya çalış.",
+            ),
+        ),
+        _MockDay(
+            "{t} kurallar ve istisnalar",
+            ("{t} için temel kurallar", "{t} ile ilgili istisnai durumlar"),
+            (
+                "Kullanılan tüm kuralları listele.",
+                "Her kural için en az bir örnek ve bir karşı-örnek bul.",
+                "Karıştırdığın kuralları yan yana yazarak karşılaştır.",
+            ),
+        ),
+    ),
+    "uygulama": (
+        _MockDay(
+            "{t} temel örnekler ve uygulama",
+            ("{t} için temel örnekler", "{t} üzerinde adım adım çözüm"),
+            (
+                "En az 5-7 temel seviye soru çöz ve çözümleri detaylı incele.",
+                "Hata yaptığın soruları işaretle ve nedenini not al.",
+                "Gerekiyorsa teorik kısma geri dönüp eksik noktalarını tamamla.",
+            ),
+        ),
+        _MockDay(
+            "{t} orta seviye karışık sorular",
+            ("{t} içeren bileşik sorular", "Adım adım çözüm stratejileri"),
+            (
+                "En az 5 orta seviye karışık soru çöz.",
+                "Her soru için kullandığın stratejiyi bir cümle ile özetle.",
+                "Zorlandığın 2-3 soruyu öğretmenine/sınıf arkadaşına sorulacak şekilde not et.",
+            ),
+        ),
+        _MockDay(
+            "{t} sözel yorum soruları",
+            ("{t} ile ilgili sözel yorumlar", "Gerçek hayat uygulamaları"),
+            (
+                "En az 3 sözel yorum sorusu çöz.",
+                "Her soru için fiziksel / günlük hayat yorumu yaz.",
+                "Konu ile ilgili kendi örnek problemini yaz ve çözmeye çalış.",
+            ),
+        ),
+    ),
+    # tekrar / sınava hazırlık
+    "tekrar": (
+        _MockDay(
+            "{t} genel tekrar ve sınav provası",
+            ("{t} için karışık seviye sorular", "{t} konu özetlerinin gözden geçirilmesi"),
+            (
+                "Zaman tutarak 8-10 karışık seviye soru çöz.",
+                "Zorlandığın alt başlıkları listele ve kısa tekrar yap.",
+                "Kendi kendine mini bir sınav yapıp sonucunu değerlendir.",
+            ),
+        ),
+        _MockDay(
+            "{t} geçmiş sınav soruları",
+            ("{t} içeren geçmiş yıl soruları", "Sık çıkan soru tipleri"),
+            (
+                "Geçmiş yıllardan en az 5 gerçek sınav sorusu çöz.",
+                "Sık tekrar eden soru kalıplarını not al.",
+                "Sürpriz gelen soru tiplerini ayrı bir listeye yaz.",
+            ),
+        ),
+    ),
+}
+
+# Strategy summary of mock plans; a focus adds one more sentence
+_MOCK_STRATEGY = (
+    "Bu çalışma planı MOCK modunda üretildi."
+    " Amaç: temelden ileri seviyeye doğru kademeli tekrar yapmak."
+)
+
+_MOCK_LAST_DAY_GOAL = "Tüm konular için genel özet çıkar ve eksik gördüğün yerleri işaretle."
+_MOCK_NOTES = "Bu plan geliştirme (mock) modunda oluşturulmuştur."
+
+
+@functools.lru_cache(maxsize=64)
+def _mock_day_templates(days: int) -> Tuple[_MockDay, ...]:
+    """
+    Day template of each day of a mock plan.
+
+    Basit aşamalı plan:
+    - İlk %30: Temel kavramlar (her gün farklı alt odak)
+    - Orta %40: Örnek soru çözümü ve uygulama
+    - Son %30: Karışık sorular, tekrar ve deneme
+    """
+    templates = []
+    for day_index in range(1, days + 1):
+        progress = day_index / days
+        if progress <= 0.3:
+            variants = _MOCK_VARIANTS["temel"]
+        elif progress <= 0.7:
+            variants = _MOCK_VARIANTS["uygulama"]
+        else:
+            variants = _MOCK_VARIANTS["tekrar"]
+        templates.append(variants[(day_index - 1) % len(variants)])
+    return tuple(templates)
+
+
+def _mock_day(day_index: int, variant: _MockDay, topic: str, daily_minutes: int) -> Dict[str, Any]:
+    """One mock plan day from its template."""
+    return {
+        "day_index": day_index,
+        "title": f"Gün {day_index}: {variant.title.format(t=topic)}",
+        "focus_topics": [item.format(t=topic) for item in variant.focus_topics],
+        "goals": [goal.format(t=topic) for goal in variant.goals],
+        "estimated_minutes": daily_minutes,
+        "notes": _MOCK_NOTES,
+    }
 
 
 class StudyPlanGenerator:
@@ -25,293 +384,554 @@ class StudyPlanGenerator:
         # MOCK mode: do not call real Gemini, build plans locally
         self.use_mock_llm = os.getenv("USE_MOCK_LLM", "false").lower() == "true"
 
+        # The SDK is heavy to import, so it is only loaded for real calls
+        self._genai = self._caching = self._google_exceptions = None
         if self.use_mock_llm:
             self.model = None
-            print("✓ StudyPlanGenerator initialized in MOCK LLM mode (no Google LLM calls)")
+            # Errors that fall back to a mock plan
+            self._gemini_errors: Tuple[type, ...] = (asyncio.TimeoutError,)
+            logger.info("StudyPlanGenerator initialized in MOCK LLM mode (no Google LLM calls)")
         else:
-            # Configure Gemini
-            genai.configure(api_key=GOOGLE_API_KEY)
-            self.model = genai.GenerativeModel(LLM_MODEL)
-            print(f"✓ StudyPlanGenerator initialized with model: {LLM_MODEL}")
+            try:
+                import google.generativeai as genai
+                from google.api_core import exceptions as google_exceptions
+                from google.generativeai import caching
+            except ImportError as exc:
+                raise ImportError(
+                    "google-generativeai is required for study plans unless USE_MOCK_LLM=true"
+                ) from exc
+            self._genai, self._caching, self._google_exceptions = genai, caching, google_exceptions
+            self._gemini_errors = (google_exceptions.GoogleAPIError, asyncio.TimeoutError)
+            self.model = get_llm_model()
+            logger.info("StudyPlanGenerator initialized with model: %s", LLM_MODEL)
 
         self.retrieval_service = get_retrieval_service()
+        self.llm_cache = get_llm_cache()
         self.generation_config = {
             "temperature": TEMPERATURE,
             "max_output_tokens": MAX_TOKENS,
         }
+        # Structured output; turned off if the model rejects response_schema
+        self.use_json_schema = PLAN_JSON_SCHEMA
+        # Single-plan models preset with each mode's instructions and
+        # generation settings, so a call only sends context + preferences
+        self._plan_models: Dict[bool, genai.GenerativeModel] = {}
+        if not self.use_mock_llm:
+            self._plan_models = {
+                json_schema: self._genai.GenerativeModel(
+                    LLM_MODEL,
+                    generation_config=self._plan_generation_config(json_schema=json_schema),
+                    system_instruction=_PLAN_INSTRUCTIONS[json_schema],
+                )
+                for json_schema in (False, True)
+            }
+
+        # Gemini context caches of plan instructions + context: key ->
+        # (model reading from the cache, monotonic time to stop using it)
+        self.use_context_cache = PLAN_CONTEXT_CACHE and not self.use_mock_llm
+        if self.use_context_cache and MAX_CONTEXT_CHARS < _MIN_CACHED_CONTEXT_CHARS:
+            logger.warning(
+                "PLAN_CONTEXT_CACHE is on but MAX_CONTEXT_CHARS=%d is below the %d chars "
+                "a context needs to be cached; plan contexts will not be cached.",
+                MAX_CONTEXT_CHARS, _MIN_CACHED_CONTEXT_CHARS,
+            )
+        self._context_models: Dict[_ContextKey, Tuple[genai.GenerativeModel, float]] = {}
+        self._context_cache_lock = threading.Lock()
+        # One event per context cache being created, set once it is done
+        self._context_creating: Dict[_ContextKey, threading.Event] = {}
+
+        # Embedding of _OVERVIEW_QUERY, computed on the first unfocused plan
+        self._overview_vector: Optional[np.ndarray] = None
+
+    def _discard_context_cache(self, key: _ContextKey) -> None:
+        """Stop using the context cache of key after Gemini rejected it."""
+        with self._context_cache_lock:
+            self._context_models.pop(key, None)
+        self.llm_cache.delete(self._shared_context_key(key))
+
+    def _shared_context_key(self, key: _ContextKey) -> str:
+        """LLM cache key under which workers share the context cache of key."""
+        vectorstore_name, context_hash, json_schema = key
+        return self.llm_cache.make_key(
+            kind="plan_context_cache",
+            model=LLM_MODEL,
+            vectorstore=vectorstore_name,
+            context=context_hash,
+            json_schema=json_schema,
+        )
+
+    def _shared_context_cache(self, key: _ContextKey) -> Optional[Tuple[caching.CachedContent, float]]:
+        """
+        A context cache another worker created for key, with its remaining
+        lifetime in seconds, if the LLM cache is shared and still holds one.
+        """
+        if not self.llm_cache.shared:
+            return None
+        shared_key = self._shared_context_key(key)
+        entry = self.llm_cache.get(shared_key)
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        try:
+            return self._caching.CachedContent.get(entry["name"]), entry["expires_at"] - time.time()
+        except (self._google_exceptions.NotFound, self._google_exceptions.PermissionDenied):
+            self.llm_cache.delete(shared_key)
+            return None
+
+    def _cached_model(
+        self, context: str
+    ) -> Optional[Tuple[_ContextKey, genai.GenerativeModel]]:
+        """
+        Model whose requests start from a cached copy of the plan
+        instructions and this context, with the cache's key, or None to
+        send the full prompt.
+
+        Plan requests on the same PDF and focus then only send the
+        preferences, and Gemini bills the cached prefix at the reduced
+        cached-token rate. Up to _MAX_CONTEXT_CACHES caches are used at
+        once; they are never deleted, only left to expire after
+        PLAN_CONTEXT_CACHE_TTL, so a cache stays valid for requests still
+        using it. With a shared LLM cache backend the cache's name is
+        stored there, so all workers use one Gemini cache instead of
+        creating one each. Concurrent requests for one context wait for a
+        single creation. Models that refuse caching turn it off for the
+        process.
+        """
+        if not self.use_context_cache or len(context) < _MIN_CACHED_CONTEXT_CHARS:
+            return None
+
+        key = (
+            self.retrieval_service.rag_pipeline.vectorstore_name,
+            hashlib.sha256(context.encode("utf-8")).hexdigest(),
+            self.use_json_schema,
+        )
+        while True:
+            with self._context_cache_lock:
+                entry = self._context_models.get(key)
+                if entry is not None and time.monotonic() < entry[1]:
+                    return key, entry[0]
+                pending = self._context_creating.get(key)
+                if pending is None:
+                    pending = self._context_creating[key] = threading.Event()
+                    break
+            # Another thread is creating this cache; wait and use its result
+            pending.wait()
+            if not self.use_context_cache:
+                return None
+
+        try:
+            created = self._create_context_model(key, context)
+            if created is None:
+                return None
+            model, lifetime = created
+            with self._context_cache_lock:
+                now = time.monotonic()
+                # Forget expired caches, then the ones expiring first
+                self._context_models = {
+                    k: v for k, v in self._context_models.items() if now < v[1]
+                }
+                while len(self._context_models) >= _MAX_CONTEXT_CACHES:
+                    oldest = min(self._context_models, key=lambda k: self._context_models[k][1])
+                    del self._context_models[oldest]
+                self._context_models[key] = (model, now + lifetime)
+            return key, model
+        finally:
+            with self._context_cache_lock:
+                del self._context_creating[key]
+            pending.set()
+
+    def _create_context_model(
+        self, key: _ContextKey, context: str
+    ) -> Optional[Tuple[genai.GenerativeModel, float]]:
+        """
+        Model on the Gemini context cache of key, reusing the one another
+        worker shared or creating it, with its lifetime in seconds; None
+        if the model refuses caching. Called outside _context_cache_lock.
+        """
+        shared = self._shared_context_cache(key)
+        if shared is not None:
+            cache, lifetime = shared
+        else:
+            try:
+                cache = self._caching.CachedContent.create(
+                    model=LLM_MODEL,
+                    display_name=f"studyrag-plan-{key[0] or 'default'}",
+                    system_instruction=_PLAN_INSTRUCTIONS[key[2]],
+                    contents=[_CONTEXT_LABEL + context],
+                    ttl=datetime.timedelta(seconds=PLAN_CONTEXT_CACHE_TTL),
+                )
+            except (
+                self._google_exceptions.PermissionDenied,
+                self._google_exceptions.FailedPrecondition,
+                self._google_exceptions.InvalidArgument,
+                self._google_exceptions.NotFound,
+            ) as exc:
+                logger.warning(
+                    "Gemini context cache unavailable for %s (%s); sending full plan prompts.",
+                    LLM_MODEL, type(exc).__name__,
+                )
+                self.use_context_cache = False
+                return None
+            # Stop a minute early rather than race the expiry
+            lifetime = PLAN_CONTEXT_CACHE_TTL - 60
+            if self.llm_cache.shared:
+                self.llm_cache.put(
+                    self._shared_context_key(key),
+                    {"name": cache.name, "expires_at": time.time() + lifetime},
+                    key[0],
+                )
+            logger.info("Plan context cached on Gemini (%d chars, %s)", len(context), cache.name)
+
+        model = self._genai.GenerativeModel.from_cached_content(
+            cached_content=cache,
+            generation_config=self._plan_generation_config(json_schema=key[2]),
+        )
+        return model, lifetime
+
+    def _plan_generation_config(
+        self,
+        num_plans: int = 1,
+        json_schema: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generation settings for a reply of num_plans plans.
+
+        More than one plan uses the batch schema. json_schema picks
+        structured output on or off; None follows use_json_schema.
+        """
+        if json_schema is None:
+            json_schema = self.use_json_schema
+        # Room for every plan: a truncated reply is unusable
+        config = dict(self.generation_config, max_output_tokens=MAX_TOKENS * num_plans)
+        if json_schema:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = _response_schema(num_plans > 1)
+        return config
+
+    def _drop_json_schema(self, exc: Exception) -> bool:
+        """
+        Switch to prose JSON instructions after Gemini rejected a request.
+
+        Returns:
+            Whether structured output was on, i.e. the request is worth
+            sending again without it
+        """
+        if not self.use_json_schema:
+            return False
+        logger.warning(
+            "%s rejected the plan request with response_schema (%s); "
+            "asking for JSON in the prompt instead.",
+            LLM_MODEL, type(exc).__name__,
+        )
+        # Context caches of the structured-output instructions are no longer
+        # looked up (their keys carry the mode) and simply expire
+        self.use_json_schema = False
+        return True
+
+    def _with_schema_fallback(self, call: Callable[[], str]) -> str:
+        """Run a Gemini call, once more without response_schema if it was rejected."""
+        try:
+            return call()
+        except self._google_exceptions.InvalidArgument as exc:
+            if not self._drop_json_schema(exc):
+                raise
+            return call()
+
+    async def _with_schema_fallback_async(self, call: Callable[[], Awaitable[str]]) -> str:
+        """Async variant of _with_schema_fallback."""
+        try:
+            return await call()
+        except self._google_exceptions.InvalidArgument as exc:
+            if not await asyncio.to_thread(self._drop_json_schema, exc):
+                raise
+            return await call()
+
+    def _generate(
+        self,
+        context: str,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str],
+    ) -> str:
+        """Call Gemini for a plan, through the context cache when possible."""
+        preferences = _preferences_block(days, daily_minutes, focus)
+        cached = self._cached_model(context)
+        if cached is not None:
+            context_key, cached_model = cached
+            try:
+                response = cached_model.generate_content(
+                    preferences + _PLAN_SUFFIXES[context_key[2]]
+                )
+                return response.text
+            except (
+                self._google_exceptions.NotFound,
+                self._google_exceptions.PermissionDenied,
+                self._google_exceptions.FailedPrecondition,
+            ) as exc:
+                # Expired or deleted under us: send the whole prompt instead
+                logger.warning(
+                    "Plan context cache rejected (%s); resending full prompt.", type(exc).__name__
+                )
+                self._discard_context_cache(context_key)
+
+        response = self._plan_models[self.use_json_schema].generate_content(
+            "".join((
+                _CONTEXT_LABEL,
+                context,
+                "\n\n",
+                preferences,
+                _PLAN_SUFFIXES[self.use_json_schema],
+            ))
+        )
+        return response.text
+
+    @staticmethod
+    async def _reply_text(
+        model: genai.GenerativeModel,
+        prompt: str,
+        on_text: Optional[Callable[[str], None]],
+    ) -> str:
+        """Send a prompt; with on_text, stream the reply and hand it each piece."""
+        if on_text is None:
+            response = await model.generate_content_async(prompt)
+            return response.text
+
+        pieces = []
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            pieces.append(chunk.text)
+            on_text(chunk.text)
+        return "".join(pieces)
+
+    async def _generate_async(
+        self,
+        context: str,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str],
+        on_text: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """
+        Async variant of _generate; cache management runs in a worker thread.
+
+        With on_text the reply is streamed, each piece passed to it as it
+        arrives.
+        """
+        preferences = _preferences_block(days, daily_minutes, focus)
+        cached = await asyncio.to_thread(self._cached_model, context)
+        if cached is not None:
+            context_key, cached_model = cached
+            try:
+                return await self._reply_text(
+                    cached_model,
+                    preferences + _PLAN_SUFFIXES[context_key[2]],
+                    on_text,
+                )
+            except (
+                self._google_exceptions.NotFound,
+                self._google_exceptions.PermissionDenied,
+                self._google_exceptions.FailedPrecondition,
+            ) as exc:
+                logger.warning(
+                    "Plan context cache rejected (%s); resending full prompt.", type(exc).__name__
+                )
+                await asyncio.to_thread(self._discard_context_cache, context_key)
+
+        return await self._reply_text(
+            self._plan_models[self.use_json_schema],
+            "".join((
+                _CONTEXT_LABEL,
+                context,
+                "\n\n",
+                preferences,
+                _PLAN_SUFFIXES[self.use_json_schema],
+            )),
+            on_text,
+        )
 
     def _build_mock_plan(
         self,
         days: int,
         daily_minutes: int,
         focus: Optional[str],
-        context_preview: str,
     ) -> Dict[str, Any]:
         """
         Fallback / mock study plan that does not depend on Gemini responses.
         Useful for development when LLM quota or model is unavailable.
         """
-        strategy_parts = [
-            "Bu çalışma planı MOCK modunda üretildi.",
-            "Amaç: temelden ileri seviyeye doğru kademeli tekrar yapmak.",
-        ]
+        strategy_summary = _MOCK_STRATEGY
         if focus:
-            strategy_parts.append(f"Öncelik verilen konu: {focus}.")
-
-        # Basit aşamalı plan:
-        # - İlk %30: Temel kavramlar (her gün farklı alt odak)
-        # - Orta %40: Örnek soru çözümü ve uygulama
-        # - Son %30: Karışık sorular, tekrar ve deneme
-        days_list: list[Dict[str, Any]] = []
-        for i in range(days):
-            day_index = i + 1
-            progress = day_index / days
-
-            if progress <= 0.3:
-                phase = "temel"
-            elif progress <= 0.7:
-                phase = "uygulama"
-            else:
-                phase = "tekrar"
-
-            base_topic = focus or "konular"
-
-            if phase == "temel":
-                temel_variants = [
-                    {
-                        "title": f"{base_topic} için temel kavramlar",
-                        "focus_topics": [
-                            f"{base_topic} ile ilgili tanımlar",
-                            f"{base_topic} için temel formüller",
-                        ],
-                        "goals": [
-                            "Ders notlarındaki ilgili teorik bölümü dikkatlice oku.",
-                            "Önemli tanım ve formülleri kendi cümlelerinle tekrar yaz.",
-                            "Kısa bir özet çıkar (maksimum 1 sayfa).",
-                        ],
-                    },
-                    {
-                        "title": f"{base_topic} grafik ve yorumlama",
-                        "focus_topics": [
-                            f"{base_topic} ile ilgili grafikler",
-                            "Grafikler üzerinden fiziksel/anlam yorumları",
-                        ],
-                        "goals": [
-                            "Notlardaki grafik örneklerini incele ve kendi grafiğini çiz.",
-                            "Grafik üzerinden en az 3 yorum cümlesi yaz.",
-                            "Grafik-tablo ilişkisini kurmaya çalış.",
-                        ],
-                    },
-                    {
-                        "title": f"{base_topic} kurallar ve istisnalar",
-                        "focus_topics": [
-                            f"{base_topic} için temel kurallar",
-                            f"{base_topic} ile ilgili istisnai durumlar",
-                        ],
-                        "goals": [
-                            "Kullanılan tüm kuralları listele.",
-                            "Her kural için en az bir örnek ve bir karşı-örnek bul.",
-                            "Karıştırdığın kuralları yan yana yazarak karşılaştır.",
-                        ],
-                    },
-                ]
-                v = temel_variants[(day_index - 1) % len(temel_variants)]
-                title = f"Gün {day_index}: {v['title']}"
-                focus_topics = v["focus_topics"]
-                goals = v["goals"]
-            elif phase == "uygulama":
-                uygulama_variants = [
-                    {
-                        "title": f"{base_topic} temel örnekler ve uygulama",
-                        "focus_topics": [
-                            f"{base_topic} için temel örnekler",
-                            f"{base_topic} üzerinde adım adım çözüm",
-                        ],
-                        "goals": [
-                            "En az 5-7 temel seviye soru çöz ve çözümleri detaylı incele.",
-                            "Hata yaptığın soruları işaretle ve nedenini not al.",
-                            "Gerekiyorsa teorik kısma geri dönüp eksik noktalarını tamamla.",
-                        ],
-                    },
-                    {
-                        "title": f"{base_topic} orta seviye karışık sorular",
-                        "focus_topics": [
-                            f"{base_topic} içeren bileşik sorular",
-                            "Adım adım çözüm stratejileri",
-                        ],
-                        "goals": [
-                            "En az 5 orta seviye karışık soru çöz.",
-                            "Her soru için kullandığın stratejiyi bir cümle ile özetle.",
-                            "Zorlandığın 2-3 soruyu öğretmenine/sınıf arkadaşına sorulacak şekilde not et.",
-                        ],
-                    },
-                    {
-                        "title": f"{base_topic} sözel yorum soruları",
-                        "focus_topics": [
-                            f"{base_topic} ile ilgili sözel yorumlar",
-                            "Gerçek hayat uygulamaları",
-                        ],
-                        "goals": [
-                            "En az 3 sözel yorum sorusu çöz.",
-                            "Her soru için fiziksel / günlük hayat yorumu yaz.",
-                            "Konu ile ilgili kendi örnek problemini yaz ve çözmeye çalış.",
-                        ],
-                    },
-                ]
-                v = uygulama_variants[(day_index - 1) % len(uygulama_variants)]
-                title = f"Gün {day_index}: {v['title']}"
-                focus_topics = v["focus_topics"]
-                goals = v["goals"]
-            else:  # tekrar / sınava hazırlık
-                tekrar_variants = [
-                    {
-                        "title": f"{base_topic} genel tekrar ve sınav provası",
-                        "focus_topics": [
-                            f"{base_topic} için karışık seviye sorular",
-                            f"{base_topic} konu özetlerinin gözden geçirilmesi",
-                        ],
-                        "goals": [
-                            "Zaman tutarak 8-10 karışık seviye soru çöz.",
-                            "Zorlandığın alt başlıkları listele ve kısa tekrar yap.",
-                            "Kendi kendine mini bir sınav yapıp sonucunu değerlendir.",
-                        ],
-                    },
-                    {
-                        "title": f"{base_topic} geçmiş sınav soruları",
-                        "focus_topics": [
-                            f"{base_topic} içeren geçmiş yıl soruları",
-                            "Sık çıkan soru tipleri",
-                        ],
-                        "goals": [
-                            "Geçmiş yıllardan en az 5 gerçek sınav sorusu çöz.",
-                            "Sık tekrar eden soru kalıplarını not al.",
-                            "Sürpriz gelen soru tiplerini ayrı bir listeye yaz.",
-                        ],
-                    },
-                ]
-                v = tekrar_variants[(day_index - 1) % len(tekrar_variants)]
-                title = f"Gün {day_index}: {v['title']}"
-                focus_topics = v["focus_topics"]
-                goals = v["goals"]
+            strategy_summary += f" Öncelik verilen konu: {focus}."
 
-            if day_index == days:
-                goals.append("Tüm konular için genel özet çıkar ve eksik gördüğün yerleri işaretle.")
-
-            days_list.append(
-                {
-                    "day_index": day_index,
-                    "title": title,
-                    "focus_topics": focus_topics,
-                    "goals": goals,
-                    "estimated_minutes": daily_minutes,
-                    "notes": "Bu plan geliştirme (mock) modunda oluşturulmuştur.",
-                }
-            )
+        base_topic = focus or "konular"
+        days_list = [
+            _mock_day(day_index, variant, base_topic, daily_minutes)
+            for day_index, variant in enumerate(_mock_day_templates(days), start=1)
+        ]
+        days_list[-1]["goals"].append(_MOCK_LAST_DAY_GOAL)
 
         return {
             "total_days": days,
             "daily_minutes": daily_minutes,
-            "strategy_summary": " ".join(strategy_parts),
+            "strategy_summary": strategy_summary,
             "days": days_list,
         }
 
-    def generate_plan(
-        self,
-        days: int,
-        daily_minutes: int,
-        focus: Optional[str] = None,
-    ) -> Dict[str, Any]:
+    def _cache_key(self, days: int, daily_minutes: int, focus: Optional[str]) -> str:
         """
-        Generate a structured study plan.
+        LLM cache key of a plan request against the loaded vectorstore.
 
-        Args:
-            days: Total number of study days (e.g. 3 or 7)
-            daily_minutes: Target minutes per day
-            focus: Optional topic to prioritize
+        Focus is compared case- and whitespace-insensitively; the cache is
+        cleared for a vectorstore when its PDF is uploaded again.
+        """
+        return self.llm_cache.make_key(
+            kind="plan",
+            days=days,
+            daily_minutes=daily_minutes,
+            focus=focus.strip().lower() if focus else "",
+            model=LLM_MODEL,
+            vectorstore=self.retrieval_service.rag_pipeline.vectorstore_name,
+            **self.generation_config,
+        )
 
-        Returns:
-            Dict that matches StudyPlanResponse schema
+    def _query_vector(self, focus: Optional[str]) -> np.ndarray:
+        """
+        Embedding of the retrieval query for a plan.
+
+        Focuses are normalized like the plan cache key, so "Türev " and
+        "türev" share one LRU-cached embedding.
         """
+        focus = (focus or "").strip().lower()
+        if focus:
+            return self.retrieval_service.embed_query(focus)
+        if self._overview_vector is None:
+            self._overview_vector = self.retrieval_service.embed_query(_OVERVIEW_QUERY)
+        return self._overview_vector
+
+    def _count_tokens(self, text: str) -> int:
+        """
+        Gemini token count of a context part.
+
+        count_tokens is a network call, so counts are kept in the LLM cache
+        (shared by workers with a shared backend). If it fails, ~4 chars per
+        token is assumed.
+        """
+        key = self.llm_cache.make_key(
+            kind="tokens",
+            model=LLM_MODEL,
+            text=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        )
+        tokens = self.llm_cache.get(key)
+        if tokens is None:
+            try:
+                tokens = self.model.count_tokens(text).total_tokens
+            except self._google_exceptions.GoogleAPIError as exc:
+                logger.warning("Gemini count_tokens failed (%s); estimating.", type(exc).__name__)
+                return len(text) // 4 + 1
+            self.llm_cache.put(key, tokens, None)
+        return tokens
+
+    def _build_context(self, documents: RetrievedBatch) -> str:
+        """
+        Prompt context of retrieved documents, at most MAX_CONTEXT_CHARS long
+        and MAX_CONTEXT_TOKENS Gemini tokens.
+
+        Gemini averages 3-4 chars per token on these notes, so tokens are
+        only counted for contexts longer than twice the budget: then once
+        for the whole context, and per part only if it is over budget.
+        """
+        context = self.retrieval_service.build_context_from_docs(
+            documents, max_chars=MAX_CONTEXT_CHARS
+        )
+        if (
+            self.model is not None
+            and 0 < MAX_CONTEXT_TOKENS < len(context) // 2
+            and self._count_tokens(context) > MAX_CONTEXT_TOKENS
+        ):
+            context = self.retrieval_service.build_context_from_docs(
+                documents,
+                max_chars=MAX_CONTEXT_CHARS,
+                max_tokens=MAX_CONTEXT_TOKENS,
+                count_tokens=self._count_tokens,
+            )
+        if logger.isEnabledFor(logging.DEBUG):
+            retrieved = sum(len(content) for content in documents.contents)
+            logger.debug(
+                "Plan context: %d of %d retrieved chars from %d chunks (~%d tokens saved)",
+                len(context), retrieved, len(documents), max(retrieved - len(context), 0) // 4,
+            )
+        return context
+
+    def _retrieve_context(self, focus: Optional[str]) -> str:
+        """Retrieve the note excerpts a plan is generated from."""
         # Ensure we have a vector store loaded
         if self.retrieval_service.rag_pipeline.vectorstore is None:
             raise ValueError(
                 "No vector store loaded. Please upload a PDF first using /upload endpoint."
             )
 
-        # Retrieve broader context from notes
-        query = focus or "Bu ders notlarının ana konuları ve öğrenme sırası nedir?"
-        documents = self.retrieval_service.retrieve_documents(
-            query=query,
-            k=TOP_K_RESULTS * 2,
+        # Retrieve broader context from notes; the query embedding is reused
+        # across plans, so only a new focus costs an embedding call. MMR
+        # keeps the TOP_K_RESULTS most diverse of the nearest chunks.
+        documents = self.retrieval_service.retrieve_by_vector(
+            self._query_vector(focus),
+            k=TOP_K_RESULTS,
+            fetch_k=TOP_K_RESULTS * 2,
+            lambda_mult=_MMR_LAMBDA,
         )
-        context = self.retrieval_service.build_context_from_docs(documents)
-        context_preview = context[:1000]
-
-        # If we are in MOCK LLM mode, skip real Gemini call entirely
-        if self.use_mock_llm:
-            return self._build_mock_plan(days, daily_minutes, focus, context_preview)
-
-        prompt = f"""
-Sen bir uzman ders koçu ve eğitim planlayıcısın.
-Görevin, verilen ders notu BAĞLAMI ve KULLANICI TERCİHLERİNE göre detaylı bir çalışma planı üretmek.
+        return self._build_context(documents)
 
-BAĞLAM (ders notlarından alınmış parçalar):
-{context}
-
-KULLANICI TERCİHLERİ:
-- Toplam gün: {days}
-- Günlük süre (dakika): {daily_minutes}
-- Özel odak: {focus or "belirtilmedi"}
-
-İSTEK:
-- Konuyu mantıklı alt başlıklara böl
-- Önce temeller, sonra orta seviye, en sonda zor konular gelsin
-- Her gün için hedefleri ve odak konuları yaz
-- Zor / önemli konulara daha fazla süre ayır
-
-SADECE AŞAĞIDAKİ JSON ŞEMASINA UYAN GEÇERLİ BİR JSON DÖNDÜR.
-Açıklama veya markdown yazma, sadece JSON.
+    def _retrieve_batch_context(self, focuses: List[Optional[str]]) -> str:
+        """
+        Retrieve one context for several plans.
 
-JSON ŞEMASI:
-{{
-  "total_days": int,                // toplam gün sayısı
-  "daily_minutes": int,             // hedef günlük süre (dakika)
-  "strategy_summary": str,          // genel stratejinin kısa özeti (Türkçe)
-  "days": [
-    {{
-      "day_index": int,             // 1..N
-      "title": str,                 // gün başlığı (örn. "Temel tanımlar")
-      "focus_topics": [str, ...],   // o gün çalışılacak ana alt konular
-      "goals": [str, ...],          // o günün öğrenme hedefleri
-      "estimated_minutes": int,     // o gün için önerilen süre
-      "notes": str                  // ek tavsiyeler (kısa)
-    }}
-  ]
-}}
-"""
+        Distinct focuses are searched in one batch and their results
+        merged round-robin, so every plan's topic is represented.
+        """
+        queries = list(dict.fromkeys(focus or _OVERVIEW_QUERY for focus in focuses))
+        if len(queries) == 1:
+            return self._retrieve_context(focuses[0])
 
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config,
+        if self.retrieval_service.rag_pipeline.vectorstore is None:
+            raise ValueError(
+                "No vector store loaded. Please upload a PDF first using /upload endpoint."
             )
-            raw_text = response.text
-        except google_exceptions.GoogleAPIError as exc:
-            print(
-                f"⚠️ StudyPlanGenerator Gemini error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK plan."
+        per_query = self.retrieval_service.retrieve_documents_batch(queries, k=TOP_K_RESULTS * 2)
+        documents = RetrievedBatch.interleave(per_query, TOP_K_RESULTS * 2)
+        return self._build_context(documents)
+
+    def _llm_error_plan(
+        self,
+        exc: Exception,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str],
+    ) -> Dict[str, Any]:
+        """Log a failed Gemini call and fall back to a mock plan."""
+        if isinstance(exc, self._gemini_errors):
+            logger.warning(
+                "StudyPlanGenerator Gemini error (%s): %s. Falling back to MOCK plan.",
+                type(exc).__name__, exc,
             )
-            return self._build_mock_plan(days, daily_minutes, focus, context_preview)
-        except Exception as exc:  # pragma: no cover - defensive
-            print(
-                f"⚠️ Unexpected StudyPlanGenerator error ({type(exc).__name__}): {exc}. "
-                "Falling back to MOCK plan."
+        else:
+            logger.error(
+                "Unexpected StudyPlanGenerator error (%s): %s. Falling back to MOCK plan.",
+                type(exc).__name__, exc,
             )
-            return self._build_mock_plan(days, daily_minutes, focus, context_preview)
+        return self._build_mock_plan(days, daily_minutes, focus)
 
+    @staticmethod
+    def _parse_plan(raw_text: str, days: int, daily_minutes: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Turn a Gemini reply into a plan dict, wrapping replies that aren't JSON.
+
+        Returns:
+            The plan and whether the reply was valid JSON
+        """
+        parsed = True
         try:
-            data = json.loads(raw_text)
-        except json.JSONDecodeError:
+            data = orjson.loads(raw_text)
+        except orjson.JSONDecodeError:
+            parsed = False
             # Fallback: sarmala ve ham metni notlara koy
             data = {
                 "total_days": days,
@@ -331,6 +951,13 @@ JSON ŞEMASI:
                 ],
             }
 
+        return StudyPlanGenerator._fill_defaults(data, raw_text, days, daily_minutes), parsed
+
+    @staticmethod
+    def _fill_defaults(
+        data: Dict[str, Any], raw_text: str, days: int, daily_minutes: int
+    ) -> Dict[str, Any]:
+        """Add the fields a plan reply may leave out."""
         # Son kontroller ve varsayılanlar
         data.setdefault("total_days", days)
         data.setdefault("daily_minutes", daily_minutes)
@@ -348,8 +975,289 @@ JSON ŞEMASI:
 
         return data
 
+    def generate_plan(
+        self,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate a structured study plan.
+
+        Args:
+            days: Total number of study days (e.g. 3 or 7)
+            daily_minutes: Target minutes per day
+            focus: Optional topic to prioritize
+
+        Returns:
+            Dict that matches StudyPlanResponse schema
+        """
+        # Same request on the same PDF: no retrieval and no Gemini call
+        cache_key = self._cache_key(days, daily_minutes, focus)
+        if not self.use_mock_llm:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        context = self._retrieve_context(focus)
+
+        # If we are in MOCK LLM mode, skip real Gemini call entirely
+        if self.use_mock_llm:
+            return self._build_mock_plan(days, daily_minutes, focus)
+
+        try:
+            raw_text = self._with_schema_fallback(
+                functools.partial(self._generate, context, days, daily_minutes, focus)
+            )
+        except Exception as exc:
+            return self._llm_error_plan(exc, days, daily_minutes, focus)
+
+        data, parsed = self._parse_plan(raw_text, days, daily_minutes)
+        # Mock fallbacks and unparseable replies are not worth keeping
+        if parsed:
+            self.llm_cache.put(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
+        return data
+
+    async def generate_plan_async(
+        self,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of generate_plan, for the API's event loop.
+
+        Retrieval (and creating a context cache) runs in a worker thread
+        and the LLM call is awaited with generate_content_async, so the
+        worker keeps serving other requests during the Gemini round-trip.
+
+        Args:
+            days: Total number of study days (e.g. 3 or 7)
+            daily_minutes: Target minutes per day
+            focus: Optional topic to prioritize
+
+        Returns:
+            Dict that matches StudyPlanResponse schema
+        """
+        cache_key = self._cache_key(days, daily_minutes, focus)
+        if not self.use_mock_llm:
+            cached = await self.llm_cache.aget(cache_key)
+            if cached is not None:
+                return cached
+
+        context = await asyncio.to_thread(self._retrieve_context, focus)
+
+        # If we are in MOCK LLM mode, skip real Gemini call entirely
+        if self.use_mock_llm:
+            return self._build_mock_plan(days, daily_minutes, focus)
+
+        try:
+            raw_text = await self._with_schema_fallback_async(
+                functools.partial(self._generate_async, context, days, daily_minutes, focus)
+            )
+        except Exception as exc:
+            return self._llm_error_plan(exc, days, daily_minutes, focus)
+
+        data, parsed = self._parse_plan(raw_text, days, daily_minutes)
+        # Mock fallbacks and unparseable replies are not worth keeping
+        if parsed:
+            await self.llm_cache.aput(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
+        return data
+
+    async def generate_plan_stream(
+        self,
+        days: int,
+        daily_minutes: int,
+        focus: Optional[str] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a study plan, yielding each day as soon as the model has
+        finished writing it.
+
+        The Gemini reply is streamed into a JSONArrayItemStream over its
+        "days" array. Streamed days are previews; the complete reply is
+        parsed like in generate_plan_async, and the plan (or the mock
+        fallback) is the last event.
+
+        Args:
+            days: Total number of study days (e.g. 3 or 7)
+            daily_minutes: Target minutes per day
+            focus: Optional topic to prioritize
+
+        Yields:
+            {"type": "day", "day": ...} events, then one
+            {"type": "plan", "plan": ...} event with the complete plan
+        """
+        cache_key = self._cache_key(days, daily_minutes, focus)
+        data = None if self.use_mock_llm else await self.llm_cache.aget(cache_key)
+        if data is None:
+            context = await asyncio.to_thread(self._retrieve_context, focus)
+            if self.use_mock_llm:
+                data = self._build_mock_plan(days, daily_minutes, focus)
+        if data is not None:
+            for day in data.get("days", []):
+                yield {"type": "day", "day": day}
+            yield {"type": "plan", "plan": data}
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        day_stream = JSONArrayItemStream("days")
+
+        def on_text(text: str) -> None:
+            for day in day_stream.feed(text):
+                queue.put_nowait(day)
+
+        task = asyncio.ensure_future(self._with_schema_fallback_async(
+            functools.partial(self._generate_async, context, days, daily_minutes, focus, on_text)
+        ))
+        # Wake the loop below when the reply is complete
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (day := await queue.get()) is not None:
+                yield {"type": "day", "day": day}
+            raw_text = task.result()
+        except Exception as exc:
+            yield {"type": "plan", "plan": self._llm_error_plan(exc, days, daily_minutes, focus)}
+            return
+        finally:
+            task.cancel()
+
+        data, parsed = self._parse_plan(raw_text, days, daily_minutes)
+        if parsed:
+            await self.llm_cache.aput(cache_key, data, self.retrieval_service.rag_pipeline.vectorstore_name)
+        yield {"type": "plan", "plan": data}
+
+    async def _generate_batch(self, requests: List[PlanArgs]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Ask Gemini for several plans in one prompt.
+
+        Returns:
+            One plan per request (mock plans if the call failed), or None
+            if the reply didn't hold a usable plan for every request
+        """
+        context = await asyncio.to_thread(
+            self._retrieve_batch_context, [focus for _, _, focus in requests]
+        )
+        preferences = "\n\n".join(
+            _preferences_block(days, daily_minutes, focus, number)
+            for number, (days, daily_minutes, focus) in enumerate(requests, start=1)
+        )
+
+        async def generate() -> str:
+            response = await self.model.generate_content_async(
+                "".join((
+                    _PLAN_BATCH_PREFIXES[self.use_json_schema],
+                    context,
+                    "\n\n",
+                    preferences,
+                    _PLAN_BATCH_SUFFIXES[self.use_json_schema],
+                )),
+                generation_config=self._plan_generation_config(len(requests)),
+            )
+            return response.text
+
+        try:
+            raw_text = await self._with_schema_fallback_async(generate)
+        except Exception as exc:
+            return [
+                self._llm_error_plan(exc, days, daily_minutes, focus)
+                for days, daily_minutes, focus in requests
+            ]
+
+        try:
+            plans = orjson.loads(raw_text).get("plans")
+        except (orjson.JSONDecodeError, AttributeError):
+            return None
+        if not isinstance(plans, list) or len(plans) != len(requests) or not all(
+            isinstance(plan, dict) and isinstance(plan.get("days"), list) and plan["days"]
+            for plan in plans
+        ):
+            return None
+
+        vectorstore_name = self.retrieval_service.rag_pipeline.vectorstore_name
+        for plan, (days, daily_minutes, focus) in zip(plans, requests):
+            self._fill_defaults(plan, raw_text, days, daily_minutes)
+            await self.llm_cache.aput(self._cache_key(days, daily_minutes, focus), plan, vectorstore_name)
+        return plans
+
+    async def generate_plans_batch(self, requests: List[PlanArgs]) -> List[Dict[str, Any]]:
+        """
+        Generate several study plans (e.g. a 3- and a 7-day plan) at once.
+
+        Cached plans are served from the LLM cache. The others share one
+        retrieved context and one Gemini call, whose prompt carries the
+        context once and a numbered preferences block per plan, instead
+        of one round-trip (and one copy of the context) per plan. If that
+        reply doesn't contain a plan for every request, they are generated
+        one by one; a single request uses generate_plan_async directly.
+
+        Args:
+            requests: (days, daily_minutes, focus) of each plan
+
+        Returns:
+            Dicts that match StudyPlanResponse schema, in request order
+        """
+        keys = [self._cache_key(*request) for request in requests]
+        plans: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        if not self.use_mock_llm:
+            plans = list(await asyncio.gather(*(self.llm_cache.aget(key) for key in keys)))
+        missing = [i for i, plan in enumerate(plans) if plan is None]
+        pending = [requests[i] for i in missing]
+
+        generated = None
+        if len(pending) > 1 and not self.use_mock_llm:
+            generated = await self._generate_batch(pending)
+            if generated is None:
+                logger.warning("Batched plan reply didn't match the requests; generating plans one by one.")
+        if generated is None:
+            generated = await self.generate_plans_parallel(pending)
+
+        for i, plan in zip(missing, generated):
+            plans[i] = plan
+        return plans
+
+    async def generate_plans_parallel(
+        self,
+        requests: List[PlanArgs],
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several study plans with one Gemini call each, concurrently.
+
+        For requests that shouldn't share a prompt (or when a batched
+        reply was unusable): the calls overlap, so the plans arrive in
+        about the time of the slowest one, while at most max_concurrency
+        are in flight. A request that hits a Gemini error gets a mock
+        plan; any other error is raised, as from generate_plan_async.
+
+        Args:
+            requests: (days, daily_minutes, focus) of each plan
+            max_concurrency: Upper bound on simultaneous Gemini calls
+
+        Returns:
+            Dicts that match StudyPlanResponse schema, in request order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(request: PlanArgs) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.generate_plan_async(*request)
+
+        results = await asyncio.gather(
+            *(generate(request) for request in requests), return_exceptions=True
+        )
+        plans = []
+        for result, (days, daily_minutes, focus) in zip(results, requests):
+            if isinstance(result, self._gemini_errors):
+                result = self._llm_error_plan(result, days, daily_minutes, focus)
+            elif isinstance(result, BaseException):
+                raise result
+            plans.append(result)
+        return plans
+
 
 _study_plan_generator: Optional[StudyPlanGenerator] = None
+_study_plan_generator_lock = threading.Lock()
 
 
 def get_study_plan_generator() -> StudyPlanGenerator:
@@ -358,7 +1266,17 @@ def get_study_plan_generator() -> StudyPlanGenerator:
     """
     global _study_plan_generator
     if _study_plan_generator is None:
-        _study_plan_generator = StudyPlanGenerator()
+        with _study_plan_generator_lock:
+            if _study_plan_generator is None:
+                _study_plan_generator = StudyPlanGenerator()
     return _study_plan_generator
 
 
+async def get_study_plan_generator_async() -> StudyPlanGenerator:
+    """
+    get_study_plan_generator for the event loop: the first call constructs
+    the generator (SDK import, retrieval service) in a worker thread.
+    """
+    if _study_plan_generator is not None:
+        return _study_plan_generator
+    return await asyncio.to_thread(get_study_plan_generator)